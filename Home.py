@@ -7,18 +7,12 @@
 
 
 import streamlit as st
+from utils.theme import HIDE_SIDEBAR_CSS, apply_css
 
 st.set_page_config(page_title="ArchiNewsCreator", page_icon="📰", layout="wide")
 
 # Hide sidebar and hamburger menu on Home page
-st.markdown("""
-<style>
-[data-testid="stSidebar"], [data-testid="stSidebarNav"], [data-testid="stSidebarNavItems"], [data-testid="stSidebarUserContent"], [data-testid="stSidebarCollapseControl"] {
-    display: none !important;
-}
-header [data-testid="stHeader"] { z-index: 1; }
-</style>
-""", unsafe_allow_html=True)
+apply_css(HIDE_SIDEBAR_CSS)
 
 # App headline in a green box with more shadow
 st.markdown(
@@ -35,12 +29,13 @@ st.markdown(
 )
 
 
-# Links to all 4 subpages
+# Links to all subpages
 st.markdown("<h3 style='color: #14532d; margin-top: 2em;'>Tools</h3>", unsafe_allow_html=True)
 st.page_link("pages/0_Project_Setup.py", label="🗂️ Project Setup")
 st.page_link("pages/1_Image_Scaler.py", label="🖼️ Image Scaler")
 st.page_link("pages/2_Website_Content.py", label="🌐 Website Content")
 st.page_link("pages/3_Instagram_Content.py", label="📸 Instagram Content")
+st.page_link("pages/4_Performance.py", label="📈 Performance")
 
 # How it works block
 st.markdown(
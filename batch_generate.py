@@ -0,0 +1,147 @@
+# Headless batch generator for website content.
+# Generates the short/medium/long articles for every saved project with each chosen style profile,
+# using the same prompts as the Project Setup page.
+#
+# Usage:
+#   python batch_generate.py --styles Lovely Faisal
+#   python batch_generate.py --projects "Elvtr Capstone" --mode combined --workers 4
+#
+# Finished items are checkpointed in <output-dir>/checkpoint.jsonl under a key of all item inputs (project, style,
+# mode, image digest); rerunning the same command resumes and skips them, while a different mode or image redoes
+# them. Each result is written to <output-dir>/<project>__<style>__<key>.json and added to the content archive.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import archive, store
+from utils.generation import GENERATION_MODES, generate_text
+from utils.llm_cache import ResponseCache
+from utils.llm_client import api_key
+
+OUTPUT_DIR = "data/batch"
+
+
+def item_key(project_name, style_name, mode, img_hash):
+    return ResponseCache.make_key({"project": project_name, "style": style_name, "mode": mode, "image": img_hash})
+
+
+def output_name(project_name, style_name, key):
+    # The slugs only make the file name readable; the key keeps names that slug alike apart
+    slug = lambda s: re.sub(r"[^A-Za-z0-9]+", "-", s).strip("-").lower() or "unnamed"
+    return f"{slug(project_name)}__{slug(style_name)}__{key[:12]}.json"
+
+
+def load_checkpoint(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run; the item is simply redone
+                    continue
+                if entry.get("status") == "done":
+                    done.add(entry["id"])
+    return done
+
+
+def run_item(project, style_name, style, mode, force, img_bytes, img_hash):
+    metrics = {}
+    timings = {}
+    results = generate_text(project, project.get("custom_usps", []), style, img_bytes, mode=mode,
+                            timings=timings, force=force, request_metrics=metrics)
+    tokens = sum(m.get("total_tokens") or 0 for m in metrics.values())
+    archive.record_web(project, project.get("custom_usps", []), style_name, style, mode, results, metrics, img_hash)
+    return {
+        "project": project.get("name", ""),
+        "style": style_name,
+        "mode": mode,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": timings.get("total"),
+        "tokens": tokens,
+        "web": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate website content for many projects and styles at once.")
+    parser.add_argument("--projects", nargs="*", help="Project names (default: all projects)")
+    parser.add_argument("--styles", nargs="*", help="Style profile names (default: all styles)")
+    parser.add_argument("--mode", choices=list(GENERATION_MODES), default="combined", help="Generation mode per item")
+    parser.add_argument("--workers", type=int, default=4, help="Items generated concurrently")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--image", help="Optional image file sent with every project")
+    parser.add_argument("--force", action="store_true", help="Skip the response cache")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and redo every item")
+    args = parser.parse_args(argv)
+
+    if not api_key():
+        print("OPENAI_API_KEY is not set.", file=sys.stderr)
+        return 2
+
+    projects = store.load_projects()
+    styles = store.load_style_profiles()
+    unknown = [n for n in args.projects or [] if n not in projects] + [n for n in args.styles or [] if n not in styles]
+    if unknown:
+        print(f"Unknown project or style: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    project_names = args.projects or list(projects)
+    style_names = args.styles or list(styles)
+    img_bytes = img_hash = None
+    if args.image:
+        with open(args.image, "rb") as f:
+            img_bytes = f.read()
+        img_hash = hashlib.sha256(img_bytes).hexdigest()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.output_dir, "checkpoint.jsonl")
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    done = load_checkpoint(checkpoint_path)
+    keys = {(p, s): item_key(p, s, args.mode, img_hash) for p in project_names for s in style_names}
+    items = [item for item, key in keys.items() if key not in done]
+    skipped = len(project_names) * len(style_names) - len(items)
+    print(f"{len(items)} items to generate, {skipped} already done, {args.workers} workers, mode {args.mode}")
+
+    succeeded = failed = tokens = 0
+    started = time.perf_counter()
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {
+            pool.submit(run_item, projects[p], s, styles[s], args.mode, args.force, img_bytes, img_hash): (p, s)
+            for p, s in items
+        }
+        for future in as_completed(futures):
+            p, s = futures[future]
+            key = keys[(p, s)]
+            try:
+                result = future.result()
+            except Exception as exc:
+                failed += 1
+                entry = {"id": key, "project": p, "style": s, "status": "failed", "error": str(exc)}
+                print(f"[failed] {p} / {s}: {exc}")
+            else:
+                with open(os.path.join(args.output_dir, output_name(p, s, key)), "w", encoding="utf-8") as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)
+                succeeded += 1
+                tokens += result["tokens"]
+                entry = {"id": key, "project": p, "style": s, "status": "done", "tokens": result["tokens"]}
+                print(f"[done] {p} / {s} ({result['seconds']:.1f}s, {result['tokens']} tokens)")
+            checkpoint.write(json.dumps(entry) + "\n")
+            checkpoint.flush()
+
+    elapsed = time.perf_counter() - started
+    rate = succeeded / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Finished {succeeded} items in {elapsed:.1f}s ({rate:.1f} items/min), {failed} failed, {tokens} tokens used")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
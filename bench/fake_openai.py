@@ -0,0 +1,179 @@
+# Local stand-in for the OpenAI chat completions endpoint, for benchmarks without network or API costs.
+# Answers POST /v1/chat/completions (plain and streamed) with placeholder text, after a configurable
+# time to first token and at a configurable token rate. A share of requests can be failed with 429 or 500
+# to exercise the retry path. JSON mode and json_schema requests get a JSON object with the required keys.
+#
+# Usage:
+#   python bench/fake_openai.py --port 8765 --latency 0.4 --token-rate 80 --failure-rate 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run Home.py
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the project brings daylight and timber into a calm sequence of public rooms along the river "
+         "while the facade responds to the street with a rhythm of deep reveals").split()
+DEFAULT_JSON_KEYS = ["short", "medium", "long"]
+
+
+class FakeConfig:
+    def __init__(self, latency=0.3, token_rate=100.0, failure_rate=0.0, failure_status=429, completion_tokens=120, seed=0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.completion_tokens = completion_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.failure_rate:
+                self.failures += 1
+                return True
+            return False
+
+
+def _words(count, offset=0):
+    return [WORDS[(offset + i) % len(WORDS)] for i in range(count)]
+
+
+def _prompt_tokens(messages):
+    total = 0
+    for message in messages:
+        content = message.get("content", "")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            total += 765 if part.get("type") == "image_url" else len(part.get("text", "")) // 4 + 1
+    return total
+
+
+def _json_keys(response_format):
+    schema = (response_format.get("json_schema") or {}).get("schema") or {}
+    return schema.get("required") or DEFAULT_JSON_KEYS
+
+
+def build_content(request, config):
+    # Returns the answer as a list of tokens (one word each) so streaming and usage agree
+    budget = min(request.get("max_tokens") or config.completion_tokens, config.completion_tokens)
+    response_format = request.get("response_format")
+    if response_format and response_format.get("type") in ("json_object", "json_schema"):
+        keys = _json_keys(response_format)
+        per_key = max(4, budget // max(1, len(keys)))
+        data = {key: {"title": " ".join(_words(4, i)).title(), "body": " ".join(_words(per_key, i))} for i, key in enumerate(keys)}
+        text = json.dumps(data)
+        # Split JSON into word-sized pieces; joining them gives back the exact document
+        tokens = [piece + " " for piece in text.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        return tokens
+    tokens = ["Headline " + " ".join(_words(5)).title() + "\n"]
+    tokens += [word + " " for word in _words(max(1, budget - 1), 5)]
+    tokens[-1] = tokens[-1].rstrip()
+    return tokens
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FakeConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data):
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        config = self.config
+        time.sleep(config.latency)
+        if config.should_fail():
+            message = "Rate limit reached (injected)" if config.failure_status == 429 else "Server error (injected)"
+            self._send_json(config.failure_status, {"error": {"message": message, "type": "fake_error"}},
+                            {"Retry-After": "0"} if config.failure_status == 429 else None)
+            return
+        model = request.get("model", "fake-model")
+        tokens = build_content(request, config)
+        usage = {"prompt_tokens": _prompt_tokens(request.get("messages", [])), "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        created = int(time.time())
+        delay = 1.0 / config.token_rate if config.token_rate > 0 else 0.0
+        if not request.get("stream"):
+            time.sleep(delay * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model}
+        for token in tokens:
+            self._send_chunk(json.dumps({**chunk, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+            time.sleep(delay)
+        self._send_chunk(json.dumps({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_chunk(json.dumps({**chunk, "choices": [], "usage": usage}))
+        self._send_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(config, host="127.0.0.1", port=0):
+    """Serve in a background thread; returns (server, base_url). Call server.shutdown() when done."""
+    handler = type("ConfiguredHandler", (Handler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="Completion tokens per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--failure-status", type=int, choices=[429, 500], default=429)
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Upper bound for answer length")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    config = FakeConfig(args.latency, args.token_rate, args.failure_rate, args.failure_status, args.completion_tokens, args.seed)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"Fake OpenAI server on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
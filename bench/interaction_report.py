@@ -0,0 +1,116 @@
+# Per-interaction report for the fragment-scoped panels.
+# Each interaction (applying a crop on the Image Scaler, a headline size on Website Content, ticking a hashtag on
+# Instagram Content) is replayed with Streamlit's AppTest, which always reruns the whole page, end to end. The
+# report gives that full rerun, which is what every interaction cost before the panels became fragments, the time
+# spent inside the affected fragment (its telemetry span), and the fragment's share of the full rerun.
+# The fragment time is not a fragment rerun latency: a real fragment rerun also pays the script runner's start-up
+# and fragment dispatch, which AppTest cannot replay on its own. The share is the part of the page's script work
+# a fragment rerun still executes; the rest is what it skips.
+# Dragging and zooming in the crop editor happen in the browser and cost no server time; applying a crop is the
+# one round trip per crop and includes its full-quality render.
+# Streamlit's own per-rerun overhead (message serialization, websocket) is not included in either number.
+#
+# Usage:
+#   python bench/interaction_report.py
+#   python bench/interaction_report.py --repeat 10 --output data/bench/interactions.json
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.run_benchmarks import prepare_workspace, synthetic_image
+
+SAMPLE_WEB = {
+    label: {"title": f"New Cultural Centre – {label} version",
+            "sections": [{"body": "The project brings daylight and timber into a calm sequence of public rooms along the river. " * n}]}
+    for label, n in (("short", 3), ("medium", 8), ("long", 16))
+}
+
+
+def seed_state(at, image_digest):
+    from utils.prompts import caption_source
+    at.session_state["web"] = SAMPLE_WEB
+    at.session_state["source_blob"] = image_digest
+    at.session_state["website_blob"] = image_digest
+    at.session_state["instagram_blob"] = image_digest
+    # The hashtags count as already generated for this article, so no OpenAI request is made
+    at.session_state["auto_hashtags"] = ["#architecture", "#timber", "#daylight"]
+    at.session_state["auto_hashtags_hash"] = hashlib.sha256(caption_source(SAMPLE_WEB).encode("utf-8")).hexdigest()
+
+
+def replay(page, fragment, interact, repeat, image_digest):
+    from streamlit.testing.v1 import AppTest
+    from utils import telemetry
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    seed_state(at, image_digest)
+    at.run()
+    full, inside = [], []
+    for i in range(repeat):
+        telemetry.clear()
+        t0 = time.perf_counter()
+        interact(at, i)
+        full.append(time.perf_counter() - t0)
+        if at.exception:
+            raise RuntimeError(f"{page}: {at.exception[0].message}")
+        # recent_spans is newest first; the first span of the rerun belongs to the fragment that was interacted with
+        spans = [s for s in telemetry.recent_spans(limit=1000) if s["name"] == fragment]
+        inside.append(spans[-1]["ms"] / 1000)
+    full_ms, fragment_ms = statistics.median(full) * 1000, statistics.median(inside) * 1000
+    return {"page": page, "fragment": fragment, "runs": repeat, "full_rerun_ms": round(full_ms, 1),
+            "in_fragment_ms": round(fragment_ms, 1), "fragment_share_pct": round(100 * fragment_ms / full_ms, 1)}
+
+
+def apply_crop(at, value):
+    # What the editor sends on "Apply crop"; AppTest cannot drive the component's frontend
+    at.session_state[f"crop_web_{at.session_state['source_blob'][:16]}"] = value
+    return at.run()
+
+
+INTERACTIONS = {
+    "apply crop": ("pages/1_Image_Scaler.py", "fragment.crop_panel",
+                   lambda at, i: apply_crop(at, {"zoom": 1.0 + 0.05 * (i + 1), "offset_x": 0.2, "offset_y": 0.0})),
+    "headline size": ("pages/2_Website_Content.py", "fragment.website_previews",
+                      lambda at, i: at.slider(key="headline_size").set_value(20 + i % 20).run()),
+    "tick hashtag": ("pages/3_Instagram_Content.py", "fragment.hashtag_panel",
+                     lambda at, i: at.checkbox(key="hashtag_#design").set_value(i % 2 == 0).run()),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show how much of a full-page rerun each interaction's fragment accounts for.")
+    parser.add_argument("--repeat", type=int, default=5, help="Interactions per panel (median is reported)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    os.environ.setdefault("ARCHINEWS_METRICS_LOG", "")
+    workspace = prepare_workspace()
+    try:
+        from utils import blobs
+        from utils.images import encode_image
+        image_digest = blobs.put(encode_image(synthetic_image(4000, 3000), "JPEG", 90))
+        results = {name: replay(page, fragment, interact, args.repeat, image_digest)
+                   for name, (page, fragment, interact) in INTERACTIONS.items()}
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+    print(f"{'interaction':<16}{'full rerun':>12}{'in fragment':>13}{'fragment share':>16}")
+    for name, row in results.items():
+        print(f"{name:<16}{row['full_rerun_ms']:>10.1f}ms{row['in_fragment_ms']:>11.1f}ms{row['fragment_share_pct']:>15}%")
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# Prompt size report.
+# Builds every prompt the app sends (per-length and combined articles, captions, hashtags) for each saved
+# project and style profile, once with the prompt templates used before utils/prompts.py and once with the
+# current builders, and prints the token counts and savings. Token counts use tiktoken when installed,
+# otherwise a character estimate (see utils.prompts.count_tokens).
+#
+# Usage:
+#   python bench/prompt_report.py
+#   python bench/prompt_report.py --output data/bench/prompts.json
+
+import argparse
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.run_benchmarks import BENCH_PROJECT, BENCH_STYLE, BENCH_USPS
+
+CAPTION_LENGTHS = [80, 200, 400]
+# A typical long article, used as caption/hashtag source text
+SAMPLE_ARTICLE = {
+    "title": "New Cultural Centre Opens Its Doors on the Riverbank",
+    "sections": [{"body": " ".join(["The project brings daylight and timber into a calm sequence of public rooms along the river, "
+                                    "while the facade responds to the street with a rhythm of deep reveals."] * 12)}],
+}
+
+
+# --- Templates before utils/prompts.py, kept verbatim for comparison ---
+def legacy_context(project, usps, style):
+    return f"""Project Name: {project.get('name','')}
+Client: {project.get('client','')}
+Location: {project.get('location','')}
+Type: {project.get('type','')}
+Size/Scope: {project.get('size_scope','')}
+Timeline: {project.get('timeline','')}
+Phase: {project.get('phase','')}
+Architectural Firm: {', '.join(project.get('architectural_firm',[]))}
+USPs: {', '.join(usps)}
+
+Style:
+- Voice: {style.get('voice','neutral')}
+- Formality: {style.get('formality','semi-formal')}"""
+
+
+def legacy_article(project, usps, style, label, word_count, with_image):
+    return f"""
+You are an expert architecture journalist. Write a news article and headline for the following project{', using the provided image for additional context' if with_image else ''}:
+
+{legacy_context(project, usps, style)}
+- Length: {label} ({word_count} words)
+- Structure: {style.get('structure','overview→details')}
+
+Write a headline and a short news article suitable for a website. Headline first, then the article body. The article body should be about {word_count} words long.
+"""
+
+
+def legacy_combined(project, usps, style, word_counts, with_image):
+    lengths = "\n".join(f"- {label}: about {word_count} words" for label, word_count in word_counts.items())
+    return f"""
+You are an expert architecture journalist. Write three versions of a news article with headline for the following project{', using the provided image for additional context' if with_image else ''}:
+
+{legacy_context(project, usps, style)}
+- Structure: {style.get('structure','overview→details')}
+
+Write one headline and article body suitable for a website for each of these lengths:
+{lengths}
+
+Respond with a JSON object with the keys {', '.join(f'"{label}"' for label in word_counts)}. Each value is an object with a "title" (the headline, plain text) and a "body" (the article body, plain text).
+"""
+
+
+def legacy_source(web):
+    article = web.get("long", {})
+    text = article.get("title", "")
+    sections = article.get("sections", [])
+    if sections and isinstance(sections[0], dict):
+        text += " " + sections[0].get("body", "")
+    return text.strip()
+
+
+def legacy_caption(text, tone, length):
+    return f"""
+You are an expert social media copywriter. Write an Instagram caption for the following architecture project, using the given style/tone and length. Do NOT repeat the website headline. Make it engaging and suitable for Instagram.
+
+Project text:
+{text}
+
+Style/Tone: {tone}
+Length: {length} characters
+
+Only output the caption text, no hashtags, no headline.
+"""
+
+
+def legacy_hashtags(text):
+    return f"Generate 15 relevant hashtags for the following Instagram post:\n{text}\nOnly output hashtags separated by spaces."
+
+
+def load_inputs():
+    from utils import store
+    projects = [(p, p.get("custom_usps") or BENCH_USPS) for p in store.load_projects().values()]
+    styles = list(store.load_style_profiles().values())
+    return projects or [(BENCH_PROJECT, BENCH_USPS)], styles or [BENCH_STYLE]
+
+
+def report(projects, styles):
+    from utils import prompts
+    from utils.generation import LENGTH_MAP
+
+    rows = {}
+
+    def add(kind, before, after, model="gpt-3.5-turbo"):
+        pair = rows.setdefault(kind, {"before": [], "after": []})
+        pair["before"].append(prompts.count_tokens(before, model))
+        pair["after"].append(prompts.count_tokens(after, model))
+
+    for project, usps in projects:
+        for style in styles:
+            for with_image, model in [(False, "gpt-3.5-turbo"), (True, "gpt-4o")]:
+                suffix = ".image" if with_image else ""
+                for label, word_count in LENGTH_MAP.items():
+                    add(f"article{suffix}", legacy_article(project, usps, style, label, word_count, with_image),
+                        prompts.prompt_text(prompts.article_prompt(project, usps, style, label, word_count, with_image, model)), model)
+                add(f"combined{suffix}", legacy_combined(project, usps, style, LENGTH_MAP, with_image),
+                    prompts.prompt_text(prompts.combined_article_prompt(project, usps, style, LENGTH_MAP, with_image, model)), model)
+    web = {label: SAMPLE_ARTICLE for label in LENGTH_MAP}
+    before_text, after_text = legacy_source(web), prompts.caption_source(web)
+    for length in CAPTION_LENGTHS:
+        add("caption", legacy_caption(before_text, "neutral", length), prompts.caption_prompt(after_text, "neutral", length))
+    add("hashtags", legacy_hashtags(before_text), prompts.hashtag_prompt(after_text))
+
+    summary = {}
+    for kind, pair in rows.items():
+        before, after = statistics.mean(pair["before"]), statistics.mean(pair["after"])
+        summary[kind] = {"prompts": len(pair["before"]), "before_tokens": round(before, 1), "after_tokens": round(after, 1),
+                         "saved_pct": round(100 * (before - after) / before, 1) if before else 0.0}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare prompt token counts before and after utils/prompts.py.")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+    projects, styles = load_inputs()
+    summary = report(projects, styles)
+    print(f"{len(projects)} project(s) x {len(styles)} style(s)")
+    print(f"{'prompt':<16}{'count':>7}{'before':>10}{'after':>10}{'saved':>9}")
+    for kind, row in summary.items():
+        print(f"{kind:<16}{row['prompts']:>7}{row['before_tokens']:>10}{row['after_tokens']:>10}{row['saved_pct']:>8}%")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# Offline benchmark suite.
+# Runs the text generation paths against the local fake OpenAI server (bench/fake_openai.py), plus the
+# image cropping/encoding and the store and cache read/write paths, in a throwaway copy of data/.
+# Results are written as JSON (one file per run, named after the time and git commit) so runs on different
+# commits can be compared with --compare.
+#
+# Usage:
+#   python bench/run_benchmarks.py
+#   python bench/run_benchmarks.py --only llm --latency 0.5 --token-rate 60 --failure-rate 0.1
+#   python bench/run_benchmarks.py --compare data/bench/<before>.json data/bench/<after>.json
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_openai import FakeConfig, start_server
+
+OUTPUT_DIR = os.path.join(ROOT, "data", "bench")
+GROUPS = ["llm", "images", "store"]
+IMAGE_SOURCES = [(1024, 768), (4000, 3000), (7700, 5200)]
+IMAGE_FRAMES = [(1600, 900), (1080, 1080)]
+BENCH_PROJECT = {
+    "name": "Benchmark Project", "client": "City of Example", "location": "Berlin", "type": "Cultural",
+    "size_scope": "12,000 m²", "timeline": "2024-2027", "phase": "Construction",
+    "architectural_firm": ["Scherzer Architekten Partnerschaft"],
+}
+BENCH_USPS = ["Exhibition halls", "Public plaza", "Historic preservation"]
+BENCH_STYLE = {"voice": "neutral", "formality": "semi-formal", "structure": "overview→details"}
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "runs": len(times),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "mean_ms": round(statistics.fmean(times) * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "max_ms": round(max(times) * 1000, 3),
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def prepare_workspace():
+    # Everything under data/ is relative to the working directory, so the suite runs in a copy
+    workspace = tempfile.mkdtemp(prefix="archinews-bench-")
+    os.makedirs(os.path.join(workspace, "data"))
+    for path in glob.glob(os.path.join(ROOT, "data", "*.json")):
+        shutil.copy(path, os.path.join(workspace, "data"))
+    os.chdir(workspace)
+    return workspace
+
+
+# --- LLM paths (fake server) ---
+def bench_llm(results, config, repeat, image_bytes):
+    from utils.generation import GENERATION_MODES, generate_caption, generate_hashtags, generate_text
+    from utils.prompts import caption_source
+
+    def record(name, fn, runs=repeat, **extra):
+        requests, failures = config.requests, config.failures
+        results[name] = measure(fn, runs, warmup=0)
+        results[name].update(requests=config.requests - requests, injected_failures=config.failures - failures, **extra)
+        print(f"  {name}: {results[name]['median_ms']:.0f} ms")
+
+    for mode in GENERATION_MODES:
+        for stream in (False, True):
+            on_token = (lambda label, text: None) if stream else None
+            record(f"generate_text.{mode}{'.stream' if stream else ''}",
+                   lambda: generate_text(BENCH_PROJECT, BENCH_USPS, BENCH_STYLE, None, mode=mode, force=True, on_token=on_token))
+    record("generate_text.combined.image",
+           lambda: generate_text(BENCH_PROJECT, BENCH_USPS, BENCH_STYLE, image_bytes, mode="combined", force=True))
+
+    # The Instagram Content page writes hashtags and captions from caption_source() of the website content
+    source = caption_source(generate_text(BENCH_PROJECT, BENCH_USPS, BENCH_STYLE, None, mode="combined", force=True))
+    record("hashtags", lambda: generate_hashtags(source, force=True))
+    for length in (80, 200, 400):
+        record(f"caption.{length}", lambda: generate_caption(source, "neutral", length, force=True))
+        record(f"caption.{length}.stream", lambda: generate_caption(source, "neutral", length, force=True, on_token=lambda text: None))
+    record("caption.cached", lambda: generate_caption(source, "neutral", 200))
+
+    # Articles, then all caption lengths and the hashtags in parallel: compare with the sum of the single requests above
+    from utils import pipeline
+    for mode in ("parallel", "combined"):
+        record(f"content_set.{mode}",
+               lambda: pipeline.run(pipeline.content_set_steps(BENCH_PROJECT, BENCH_USPS, BENCH_STYLE, None, mode, "neutral", force=True)))
+
+
+# --- Images ---
+def synthetic_image(width, height):
+    # Gradients plus noise: compresses roughly like a photo instead of a flat colour
+    from PIL import Image
+    gradient = Image.linear_gradient("L").resize((width, height))
+    return Image.merge("RGB", [gradient, Image.effect_noise((width, height), 40), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)])
+
+
+def bench_images(results, repeat):
+    from PIL import Image
+    from utils.images import _prepare_image, encode_image, fit_image_with_offset
+
+    def record(name, fn, runs=repeat):
+        results[name] = measure(fn, runs)
+        print(f"  {name}: {results[name]['median_ms']:.1f} ms")
+
+    for width, height in IMAGE_SOURCES:
+        source = synthetic_image(width, height)
+        for frame_w, frame_h in IMAGE_FRAMES:
+            for resample, resample_name in ((Image.LANCZOS, "lanczos"), (Image.BILINEAR, "bilinear")):
+                record(f"fit.{width}x{height}->{frame_w}x{frame_h}.{resample_name}",
+                       lambda: fit_image_with_offset(source, frame_w, frame_h, 1.2, 0.1, -0.1, resample=resample, oriented=True))
+        upload = encode_image(source, "JPEG", 92)
+        # prepare_image is memoized per upload; _prepare_image measures the real work
+        record(f"prepare_image.{width}x{height}", lambda: _prepare_image(upload, "JPEG", 85))
+
+    frame = fit_image_with_offset(synthetic_image(4000, 3000), 1600, 900, oriented=True)
+    for fmt, quality in (("JPEG", 92), ("WEBP", 90), ("PNG", None)):
+        record(f"encode.1600x900.{fmt.lower()}", lambda: encode_image(frame, fmt, quality))
+
+
+# --- Store, data layer and response cache ---
+def bench_store(results, repeat, project_count):
+    from utils import data, store
+    from utils.llm_cache import ResponseCache
+
+    def record(name, fn, runs=repeat):
+        results[name] = measure(fn, runs)
+        print(f"  {name}: {results[name]['median_ms']:.2f} ms")
+
+    types = ["School", "Residential", "Office", "Mixed-use", "Cultural"]
+    projects = {}
+    for i in range(project_count):
+        project = {**BENCH_PROJECT, "name": f"Project {i:04d}", "type": types[i % len(types)]}
+        projects[project["name"]] = {**project, "custom_usps": [f"USP {i % 40}", f"USP {(i * 7) % 40}"]}
+        store.save_project(project)
+        store.save_project_usps(project["name"], projects[project["name"]]["custom_usps"])
+
+    record(f"store.load_projects.{project_count}", store.load_projects)
+    record("store.get_project", lambda: store.get_project("Project 0001"))
+    record("store.save_project", lambda: store.save_project({**BENCH_PROJECT, "name": "Project 0001", "type": "School"}))
+    record("store.save_project_usps", lambda: store.save_project_usps("Project 0001", ["USP 1", "USP 2", "USP 3"]))
+    record("store.top_usps", lambda: store.top_usps("Office", "usp 1"))
+    record(f"data.get_projects.cached.{project_count}", data.get_projects)
+
+    # The JSON files the store replaced: read everything, rewrite everything on each save
+    json_path = os.path.join("data", "bench_projects.json")
+
+    def json_save():
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(projects, f, ensure_ascii=False, indent=2)
+
+    def json_load():
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    record(f"json.save_projects.{project_count}", json_save)
+    record(f"json.load_projects.{project_count}", json_load)
+
+    cache = ResponseCache(os.path.join("data", "cache", "bench"))
+    content = "lorem ipsum " * 200
+    counter = iter(range(10 ** 9))
+    record("response_cache.put", lambda: cache.put(cache.make_key({"n": next(counter)}), content))
+    key = cache.make_key({"n": 0})
+    record("response_cache.get", lambda: cache.get(key))
+
+
+def compare(before_path, after_path):
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{'benchmark':<52}{before['meta']['commit']:>12}{after['meta']['commit']:>12}{'change':>9}")
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        a = before["results"].get(name, {}).get("median_ms")
+        b = after["results"].get(name, {}).get("median_ms")
+        change = f"{(b - a) / a * 100:+.0f}%" if a and b is not None else "-"
+        fmt = lambda v: f"{v:.1f}ms" if v is not None else "-"
+        print(f"{name:<52}{fmt(a):>12}{fmt(b):>12}{change:>9}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite against a local fake OpenAI server.")
+    parser.add_argument("--only", nargs="*", choices=GROUPS, help="Benchmark groups to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (median is reported)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake server: seconds to first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake server: completion tokens per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fake server: share of requests failed with 429/500")
+    parser.add_argument("--failure-status", type=int, choices=[429, 500], default=429)
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Fake server: upper bound for answer length")
+    parser.add_argument("--projects", type=int, default=200, help="Projects in the store benchmark")
+    parser.add_argument("--output", help="Result file (default: data/bench/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return compare(*args.compare)
+
+    groups = args.only or GROUPS
+    config = FakeConfig(args.latency, args.token_rate, args.failure_rate, args.failure_status, args.completion_tokens)
+    server, base_url = start_server(config)
+    # Set before utils is imported: the client and the rate limiter read these once
+    os.environ.update(OPENAI_BASE_URL=base_url, OPENAI_API_KEY="fake-key", OPENAI_RPM_LIMIT="100000",
+                      OPENAI_TPM_LIMIT="100000000", NO_PROXY="127.0.0.1,localhost")
+    commit = git_commit()
+    output = os.path.abspath(args.output) if args.output else os.path.join(OUTPUT_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    workspace = prepare_workspace()
+    results = {}
+    started = time.perf_counter()
+    try:
+        if "llm" in groups:
+            print(f"LLM paths against {base_url}")
+            from utils.images import encode_image
+            bench_llm(results, config, args.repeat, encode_image(synthetic_image(4000, 3000), "JPEG", 90))
+        if "images" in groups:
+            print("Images")
+            bench_images(results, args.repeat)
+        if "store" in groups:
+            print("Store and caches")
+            bench_store(results, args.repeat, args.projects)
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "groups": groups,
+            "repeat": args.repeat,
+            "fake_server": {"latency": args.latency, "token_rate": args.token_rate, "failure_rate": args.failure_rate,
+                            "failure_status": args.failure_status, "completion_tokens": args.completion_tokens,
+                            "requests": config.requests, "injected_failures": config.failures},
+            "seconds": round(time.perf_counter() - started, 1),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# Cold-start report for the Streamlit pages.
+# Every page is rendered in a fresh Python process with Streamlit's AppTest: the first run pays for imports
+# and module-level setup, the second run is a normal rerun. The difference is the cold-start overhead.
+# The report also lists which heavy libraries the first render pulled in.
+#
+# Usage:
+#   python bench/startup_report.py
+#   python bench/startup_report.py --repeat 5 --output data/bench/startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = [
+    "Home.py",
+    "pages/0_Project_Setup.py",
+    "pages/1_Image_Scaler.py",
+    "pages/2_Website_Content.py",
+    "pages/3_Instagram_Content.py",
+    "pages/4_Performance.py",
+]
+HEAVY_MODULES = ["openai", "PIL.Image", "dotenv", "httpx"]
+
+PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+page = sys.argv[1]
+before = set(sys.modules)
+t0 = time.perf_counter()
+at = AppTest.from_file(page, default_timeout=60).run()
+first = time.perf_counter() - t0
+loaded = set(sys.modules) - before
+t0 = time.perf_counter()
+at.run()
+warm = time.perf_counter() - t0
+print(json.dumps({
+    "first_render": first,
+    "warm_render": warm,
+    "modules_loaded": len(loaded),
+    "heavy_modules": [m for m in %r if m in loaded],
+    "exception": [str(e.value) for e in at.exception],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def probe_page(page):
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    out = subprocess.run([sys.executable, "-c", PROBE, page], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import cost and first-render latency per page.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh processes per page (median is reported)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for page in PAGES:
+        runs = [probe_page(page) for _ in range(max(1, args.repeat))]
+        first = statistics.median(r["first_render"] for r in runs)
+        warm = statistics.median(r["warm_render"] for r in runs)
+        results[page] = {
+            "first_render_ms": round(first * 1000, 1),
+            "warm_render_ms": round(warm * 1000, 1),
+            "cold_overhead_ms": round((first - warm) * 1000, 1),
+            "modules_loaded": runs[0]["modules_loaded"],
+            "heavy_modules": runs[0]["heavy_modules"],
+            "exception": runs[0]["exception"],
+        }
+
+    print(f"{'page':<32}{'first':>10}{'warm':>10}{'cold':>10}{'modules':>9}  heavy")
+    for page, r in results.items():
+        print(f"{page:<32}{r['first_render_ms']:>8.0f}ms{r['warm_render_ms']:>8.0f}ms{r['cold_overhead_ms']:>8.0f}ms"
+              f"{r['modules_loaded']:>9}  {', '.join(r['heavy_modules']) or '-'}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "pages": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
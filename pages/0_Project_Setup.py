@@ -1,47 +1,17 @@
 import streamlit as st
-import json
-import os
-from dotenv import load_dotenv
-import openai
+from utils.generation import GENERATION_MODES, generate_text
+from utils.llm_cache import cache_stats_caption, format_stream_metrics
+from utils.llm_client import api_key
+from utils import archive, blobs, data, jobs, pipeline, renditions, store, telemetry
+from utils.theme import divider, page_header
 
-# --- Paths ---
-PROJECTS_PATH = "data/projects.json"
-STYLES_PATH = "data/styles.json"
-os.makedirs("data", exist_ok=True)
+telemetry.begin_rerun("Project Setup")
+FINISHED_JOBS = jobs.collect(st.session_state)
 
 # --- Load Data ---
-def load_json(path):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-def save_json(path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-
-PROJECTS = load_json(PROJECTS_PATH)
-STYLES = load_json(STYLES_PATH)
-
-st.markdown("""
-<style>
-div.stButton > button {
-    background-color: #14532d !important; /* dark green fill */
-    color: white !important;
-    border: none !important;
-    border-radius: 6px !important;
-    padding: 0.5em 1.5em !important;
-    font-size: 1.08em !important;
-    font-weight: 600 !important;
-    transition: background 0.2s;
-}
-div.stButton > button:hover {
-    background-color: #d1d5db !important; /* lighter gray on hover */
-    color: #fff !important;
-}
-</style>
-""", unsafe_allow_html=True)
+# Shared, cached views of the store: read-only here, saves go through store and are picked up on the next read
+PROJECTS = data.get_projects()
+STYLES = data.get_style_profiles()
 
 # --- USPS Presets ---
 USPS_PRESETS = {
@@ -52,70 +22,8 @@ USPS_PRESETS = {
     "Cultural": ["Exhibition halls", "Performance spaces", "Historic preservation"]
 }
 
-# --- OpenAI Setup ---
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# --- Content Generation ---
-def generate_text(project, usps, style, img_bytes):
-    length_map = {"short": 50, "medium": 120, "long": 250}
-    results = {}
-    for label, word_count in length_map.items():
-        prompt = f"""
-You are an expert architecture journalist. Write a news article and headline for the following project{', using the provided image for additional context' if img_bytes else ''}:
-
-Project Name: {project.get('name','')}
-Client: {project.get('client','')}
-Location: {project.get('location','')}
-Type: {project.get('type','')}
-Size/Scope: {project.get('size_scope','')}
-Timeline: {project.get('timeline','')}
-Phase: {project.get('phase','')}
-Architectural Firm: {', '.join(project.get('architectural_firm',[]))}
-USPs: {', '.join(usps)}
-
-Style:
-- Voice: {style.get('voice','neutral')}
-- Formality: {style.get('formality','semi-formal')}
-- Length: {label} ({word_count} words)
-- Structure: {style.get('structure','overview→details')}
-
-Write a headline and a short news article suitable for a website. Headline first, then the article body. The article body should be about {word_count} words long.
-"""
-        if img_bytes:
-            import base64
-            img_b64 = base64.b64encode(img_bytes).decode()
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                    ]
-                }],
-                max_tokens=800,
-                temperature=0.7
-            )
-        else:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.7
-            )
-        output = response.choices[0].message.content
-        lines = output.strip().splitlines()
-        headline = lines[0] if lines else "[No headline generated]"
-        body = "\n".join(lines[1:]).strip() if len(lines) > 1 else "[No article generated]"
-        results[label] = {"title": headline, "sections": [{"body": body}]}
-    return results
-
 # --- Project Card ---
-st.markdown("""
-<h1 style='font-size:2.3em; color:#14532d; margin-bottom:0.5em;'>Project Setup</h1>
-<div style='font-size:1.15em; color:#222; margin-bottom:2em;'>Enter and save your project details, USPs, and style profiles for content generation.</div>
-""", unsafe_allow_html=True)
+page_header("Project Setup", "Enter and save your project details, USPs, and style profiles for content generation.")
 st.header("Project Card")
 project_names = ["(new project)"] + list(PROJECTS.keys())
 selected_project = st.selectbox("Select project", project_names, index=0, key="project_select")
@@ -135,7 +43,7 @@ firm_options = ["Scherzer Architekten", "Scherzer Architekten Partnerschaft"]
 selected_firms = st.multiselect("Architectural Firm", firm_options, default=proj.get("architectural_firm", []), key="firm_select")
 if st.button("Save Project Card", key="save_project_btn"):
     if p_name.strip():
-        PROJECTS[p_name.strip()] = {
+        store.save_project({
             "name": p_name.strip(),
             "client": p_client.strip(),
             "location": p_loc.strip(),
@@ -145,8 +53,8 @@ if st.button("Save Project Card", key="save_project_btn"):
             "timeline": p_time.strip(),
             "phase": p_phase.strip(),
             "architectural_firm": selected_firms
-        }
-        save_json(PROJECTS_PATH, PROJECTS)
+        })
+        PROJECTS = data.get_projects()
         st.session_state["active_project"] = PROJECTS[p_name.strip()]
         st.success("Project saved. Re-select it from the dropdown to use it.")
     else:
@@ -170,12 +78,12 @@ if chosen_style == "(new style)":
     structure = st.selectbox("Structure", ["overview→details","problem→solution","milestone update"], index=2, key="structure_select")
     if st.button("Save style profile", key="save_style_btn"):
         if style_name_input.strip():
-            STYLES[style_name_input.strip()] = {
+            store.save_style_profile(style_name_input.strip(), {
                 "voice": chosen_voice,
                 "formality": formality,
                 "structure": structure
-            }
-            save_json(STYLES_PATH, STYLES)
+            })
+            STYLES = data.get_style_profiles()
             st.success("Style saved.")
         else:
             st.error("Please enter a style name before saving.")
@@ -193,15 +101,15 @@ else:
     formality = st.selectbox("Formality", ["formal","semi-formal","conversational"], index=["formal","semi-formal","conversational"].index(style_obj["formality"]), key="formality_select_existing")
     structure = st.selectbox("Structure", ["overview→details","problem→solution","milestone update"], index=["overview→details","problem→solution","milestone update"].index(style_obj["structure"]), key="structure_select_existing")
     if st.button("Update style profile", key="update_style_btn"):
-        STYLES[chosen_style] = {
+        store.save_style_profile(chosen_style, {
             "voice": chosen_voice,
             "formality": formality,
             "structure": structure
-        }
-        save_json(STYLES_PATH, STYLES)
+        })
+        STYLES = data.get_style_profiles()
         st.success("Style updated.")
 
-st.markdown("<hr style='border: none; border-top: 2px solid #d1d5db; margin: 2em 0;'>", unsafe_allow_html=True)
+divider()
 
 # --- USPs Section ---
 st.header("USPs for website content")
@@ -218,24 +126,31 @@ custom_usps_raw = st.text_input("Custom USPs (comma-separated)")
 custom_usps = [x.strip() for x in custom_usps_raw.split(",") if x.strip()]
 
 # --- Saved Custom USPs Tick List ---
-saved_custom_usps = set()
-for p in PROJECTS.values():
-    usps = p.get("custom_usps", [])
-    for usp in usps:
-        saved_custom_usps.add(usp)
-saved_custom_usps = sorted(saved_custom_usps)
+# Ranked lookup in the USP index: the most used USPs for this project type first, filterable by text
+SAVED_USPS_SHOWN = 12
+usp_filter = st.text_input("Filter previously saved custom USPs", key="usp_filter")
+ticked_saved_usps = [k[len("saved_usp_"):] for k, v in st.session_state.items() if k.startswith("saved_usp_") and v]
+saved_custom_usps = data.get_top_usps(p_type, usp_filter, SAVED_USPS_SHOWN)
+# Keep ticked USPs on screen even when the filter no longer matches them
+shown = {usp for usp, _, _ in saved_custom_usps}
+saved_custom_usps = [(usp, None, None) for usp in ticked_saved_usps if usp not in shown] + saved_custom_usps
 if saved_custom_usps:
-    st.markdown("**Previously saved custom USPs:**")
+    st.markdown(f"**Previously saved custom USPs** (most used for {p_type} projects first):")
     selected_saved_usps = []
-    for usp in saved_custom_usps:
-        if st.checkbox(usp, key=f"saved_usp_{usp}"):
-            selected_saved_usps.append(usp)
+    cols = st.columns(2)
+    for i, (usp, type_count, total) in enumerate(saved_custom_usps):
+        with cols[i % 2]:
+            help_text = f"Used in {type_count} {p_type} project(s), {total} overall" if total is not None else None
+            if st.checkbox(usp, key=f"saved_usp_{usp}", help=help_text):
+                selected_saved_usps.append(usp)
     custom_usps += selected_saved_usps
+elif usp_filter:
+    st.caption("No saved custom USPs match the filter.")
 def dedupe(seq):
     s = set()
     out = []
     for x in seq:
-        xl = x.lower()
+        xl = store.normalize_usp(x)
         if xl not in s:
             s.add(xl)
             out.append(x)
@@ -243,22 +158,51 @@ def dedupe(seq):
 usps_final = dedupe(selected_usps + custom_usps)
 if st.button("Save USPs", key="save_usps_btn"):
     if p_name.strip() and p_name.strip() in PROJECTS:
-        PROJECTS[p_name.strip()]["custom_usps"] = usps_final
-        save_json(PROJECTS_PATH, PROJECTS)
+        store.save_project_usps(p_name.strip(), usps_final)
+        PROJECTS = data.get_projects()
         st.success("USPs saved for this project.")
     else:
         st.warning("Please select or save a project card first.")
 
-st.markdown("<hr style='border: none; border-top: 2px solid #d1d5db; margin: 2em 0;'>", unsafe_allow_html=True)
+divider()
 
 # --- Image Upload ---
 st.header("Image Upload")
 uploaded_img = st.file_uploader("Upload project image (photo or rendering)", type=["png", "jpg", "jpeg"])
 
-st.markdown("<hr style='border: none; border-top: 2px solid #d1d5db; margin: 2em 0;'>", unsafe_allow_html=True)
+divider()
 
 # --- Content Generator ---
 st.header("Content Generator")
+generation_mode = st.radio("Generation mode", list(GENERATION_MODES), format_func=GENERATION_MODES.get, index=0, horizontal=True, key="generation_mode")
+force_regenerate = st.checkbox("Force regenerate (skip response cache)", value=False, key="force_regenerate")
+stream_output = st.checkbox("Stream output while generating", value=True, key="stream_output")
+full_content_set = st.checkbox("Also write the Instagram captions (80/200/400) and hashtags", value=False, key="full_content_set")
+
+
+def run_generation_job(job, project, usps, style_name, style, img_bytes, img_hash, mode, force, stream):
+    # Runs on the job pool: keeps going across reruns and page switches; the result lands in session state via jobs.collect
+    timings = {}
+    request_metrics = {}
+    results = generate_text(project, usps, style, img_bytes, mode=mode, timings=timings, force=force,
+                            on_token=job.on_token if stream else None, request_metrics=request_metrics)
+    archive.record_web(project, usps, style_name, style, mode, results, request_metrics, img_hash)
+    return {"web": results, "generation_timings": timings, "stream_metrics": request_metrics if stream else {}}
+
+
+@st.fragment(run_every=0.5)
+def generation_progress():
+    # Polls the running job; only rendered while one is pending, so idle pages do not poll
+    running = jobs.pending(st.session_state, "web")
+    if not running:
+        st.rerun()
+    for job in running:
+        st.info(f"Generating website content for {job.label} – {job.status}, {job.elapsed():.0f}s (job {job.id}). "
+                "You can switch pages; the result is kept for this session.")
+        for label, text in job.stream_snapshot().items():
+            st.markdown(f"**{label.title()}**\n\n{text}")
+
+
 if st.button("Generate Website Content", key="generate_content_btn"):
     project = PROJECTS.get(p_name.strip())
     if project and project.get("name", "").strip():
@@ -266,22 +210,27 @@ if st.button("Generate Website Content", key="generate_content_btn"):
         usps = usps_final
         img_bytes = uploaded_img.read() if uploaded_img else None
         if img_bytes:
-            st.session_state["website_img"] = img_bytes
-            try:
-                from PIL import Image
-                import io
-                pil_img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                st.session_state["base_img"] = pil_img
-            except Exception:
-                st.session_state["base_img"] = None
-        if openai.api_key:
-            with st.spinner("Generating website content..."):
-                try:
-                    results = generate_text(project, usps, style, img_bytes)
-                    st.session_state["web"] = results
-                    st.success("Website content generated! Go to the Website Content page to view it.")
-                except Exception as e:
-                    st.error(f"Error generating content: {e}")
+            # Session state keeps only the digest; the bytes live once in the blob store
+            img_hash = blobs.store(st.session_state, "source_blob", img_bytes)
+            # The Website and Instagram pages show the default crops until one is applied on the Image Scaler
+            renditions.store_default_crops(st.session_state, img_hash)
+        if api_key():
+            style_name = style_name_input.strip() if chosen_style == "(new style)" else chosen_style
+            img_hash = st.session_state.get("source_blob") if img_bytes else None
+            key = jobs.input_key("web", project=project, usps=usps, style=style, image=img_hash, mode=generation_mode, force=force_regenerate,
+                                 full=full_content_set)
+            if full_content_set:
+                # Articles, then the three caption lengths and the hashtags in parallel; the tone and endings chosen on the Instagram page apply
+                tone = st.session_state.get("caption_style", "neutral")
+                endings = [e for e in st.session_state.get("caption_endings", []) if st.session_state.get(f"ending_{e}", False)]
+                job_id, attached = jobs.submit("web", key, pipeline.content_set_job, project, usps, style_name, style, img_bytes, img_hash,
+                                               generation_mode, tone, endings, force_regenerate, stream_output, label=project["name"])
+            else:
+                job_id, attached = jobs.submit("web", key, run_generation_job, project, usps, style_name, style, img_bytes, img_hash,
+                                               generation_mode, force_regenerate, stream_output, label=project["name"])
+            jobs.track(st.session_state, job_id)
+            if attached:
+                st.info(f"The same content is already being generated (job {job_id}); its result will be shown here.")
         else:
             st.warning("OpenAI API key not set. Cannot generate content.")
     else:
@@ -293,5 +242,24 @@ if st.button("Generate Website Content", key="generate_content_btn"):
         else:
             st.warning("Please select a project before generating content.")
 
+# A job that finished during this run (e.g. from cached responses) is applied now; a running one is polled
+if jobs.pending(st.session_state, "web"):
+    generation_progress()
+FINISHED_JOBS += jobs.collect(st.session_state)
+if any(job.kind == "web" and job.status == "done" for job in FINISHED_JOBS):
+    st.success("Website content generated! Go to the Website Content page to view it.")
+job_error = st.session_state.pop("web_job_error", None)
+if job_error:
+    st.error(f"Error generating content: {job_error}")
 
-
+timings = st.session_state.get("generation_timings")
+if timings:
+    per_length = " · ".join(f"{label}: {seconds:.1f}s" for label, seconds in timings.items() if label != "total")
+    st.caption(f"Last generation – {per_length} · total wall-clock: {timings['total']:.1f}s")
+pipeline_timings = st.session_state.get("pipeline_timings")
+if pipeline_timings:
+    st.caption(f"Last content set – {pipeline.format_timings(pipeline_timings)}")
+stream_metrics = st.session_state.get("stream_metrics")
+if stream_metrics:
+    st.caption("Streaming – " + " · ".join(f"{label}: {format_stream_metrics(m)}" for label, m in stream_metrics.items()))
+st.caption(cache_stats_caption())
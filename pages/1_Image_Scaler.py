@@ -1,123 +1,45 @@
 
 
-import io
 import streamlit as st
-from PIL import Image, ImageOps
+from utils.images import IMAGE_MIME_TYPES, RENDITIONS
+from utils.renditions import EXPORT_FORMATS, RENDITION_SIZES, export_renditions, render_crop
+from utils.crop_editor import crop_editor
+from utils.media import begin_payload_tracking, image_url, payload_caption, render_html
+from utils.theme import page_header
+from utils import blobs, jobs, telemetry
 
 st.set_page_config(page_title="Image Scaler", page_icon="🖼️", layout="wide")
+begin_payload_tracking()
+telemetry.begin_rerun("Image Scaler")
+jobs.collect(st.session_state)
 
-st.markdown("""
-<style>
-div.stButton > button {
-    background-color: #14532d !important; /* dark green fill */
-    color: white !important;
-    border: none !important;
-    border-radius: 6px !important;
-    padding: 0.5em 1.5em !important;
-    font-size: 1.08em !important;
-    font-weight: 600 !important;
-    transition: background 0.2s;
-}
-div.stButton > button:hover {
-    background-color: #d1d5db !important; /* lighter gray on hover */
-    color: #fff !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
-
-st.markdown("""
-<h1 style='font-size:2.3em; color:#14532d; margin-bottom:0.5em;'>Image Scaler</h1>
-<div style='font-size:1.15em; color:#222; margin-bottom:2em;'>Resize, crop, and preview your project images for website and Instagram formats.</div>
-""", unsafe_allow_html=True)
-
-def fit_image_with_offset(img: Image.Image, frame_w, frame_h, zoom=1.0, offset_x=0.0, offset_y=0.0):
-    base = ImageOps.exif_transpose(img).convert("RGB")
-    iw, ih = base.size
-    target_ratio = frame_w / frame_h
-    img_ratio = iw / ih
-
-    # Calculate scale to cover the frame
-    if img_ratio > target_ratio:
-        scale = frame_h / ih
-    else:
-        scale = frame_w / iw
-    scale *= max(zoom, 0.1)
-
-    new_w = int(iw * scale)
-    new_h = int(ih * scale)
-    scaled = base.resize((new_w, new_h), Image.LANCZOS)
-
-    # Center the image, then apply offset
-    max_dx = max(0, new_w - frame_w)
-    max_dy = max(0, new_h - frame_h)
-    # Offset is always relative to center
-    px = int((frame_w - new_w) / 2 - (max_dx / 2) * offset_x)
-    py = int((frame_h - new_h) / 2 - (max_dy / 2) * offset_y)
-
-    canvas = Image.new("RGB", (frame_w, frame_h), (255, 255, 255))
-    canvas.paste(scaled, (px, py))
-    return canvas
-
-def show_framed_image(img, caption, aspect_w, aspect_h):
-    import base64
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
-    # Responsive width: fill container, keep aspect ratio
-    html = f"""
-    <div style="
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        width: 100%;
-        max-width: 900px;
-        margin: 0 auto 16px auto;
-    ">
-      <div style="
-        border:2px solid #444;
-        border-radius:18px;
-        background:#222;
-        overflow:hidden;
-        width:100%;
-        aspect-ratio:{aspect_w}/{aspect_h};
-        box-sizing:border-box;
-        display:flex;
-        align-items:center;
-        justify-content:center;
-      ">
-        <img src="data:image/png;base64,{b64}" style="
-            width:100%;
-            height:100%;
-            object-fit:cover;
-            display:block;
-        ">
-      </div>
-    </div>
-    <div style="font-size:1rem;margin-bottom:1.5em;text-align:center;">{caption}</div>
-    """
-    st.markdown(html, unsafe_allow_html=True)
 
-def copy_image_button(label, img: Image.Image):
-    import base64
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode()
+page_header("Image Scaler", "Resize, crop, and preview your project images for website and Instagram formats.")
+
+PREVIEW_MAX_EDGE = 1600
+PREVIEW_QUALITY = 85
+
+# Decoded originals and preview proxies come from the blob store's shared LRU, keyed by the upload's digest
+def editor_source(img_hash):
+    # One JPEG proxy per upload, shared by both crop editors; the browser fetches it once and pans/zooms it locally
+    data = RENDITIONS.get_or_encode(("proxy", img_hash), lambda: blobs.image(img_hash, PREVIEW_MAX_EDGE), "JPEG", PREVIEW_QUALITY)
+    return image_url(data, IMAGE_MIME_TYPES["JPEG"])
+
+def copy_image_button(label, png_data):
+    src = image_url(png_data, "image/png")
+    btn_id = f"{hash(png_data) & 0xFFFFFFFF:x}"
     html = f"""
-    <button id="cpy_{hash(b64)}" style="padding:8px 12px;border:1px solid #198754;border-radius:8px;background:#222;color:white;cursor:pointer;margin-bottom:8px;">
+    <button id="cpy_{btn_id}" style="padding:8px 12px;border:1px solid #198754;border-radius:8px;background:#222;color:white;cursor:pointer;margin-bottom:8px;">
         {label}
     </button>
-    <span id="msg_{hash(b64)}" style="margin-left:8px;color:#198754;"></span>
+    <span id="msg_{btn_id}" style="margin-left:8px;color:#198754;"></span>
     <script>
-    const btn = document.getElementById("cpy_{hash(b64)}");
-    const msg = document.getElementById("msg_{hash(b64)}");
+    const btn = document.getElementById("cpy_{btn_id}");
+    const msg = document.getElementById("msg_{btn_id}");
     btn.addEventListener("click", async () => {{
       try {{
-        const b = atob("{b64}");
-        const len = b.length;
-        const bytes = new Uint8Array(len);
-        for (let i=0; i<len; i++) bytes[i] = b.charCodeAt(i);
-        const blob = new Blob([bytes], {{type: "image/png"}});
+        const resp = await fetch("{src}");
+        const blob = new Blob([await resp.blob()], {{type: "image/png"}});
         await navigator.clipboard.write([new ClipboardItem({{"image/png": blob}})]);
         msg.textContent = "Copied!";
         setTimeout(() => msg.textContent = "", 1600);
@@ -128,39 +50,95 @@ def copy_image_button(label, img: Image.Image):
     }});
     </script>
     """
-    st.components.v1.html(html, height=60)
-
-base_img = st.session_state.get("base_img", None)
-if base_img:
-    st.subheader("Website Hero Image (1600×900)")
-    colZ1, colXY1 = st.columns([1,1])
-    with colZ1:
-        zoom_web = st.slider("Website Zoom", 0.1, 3.0, 1.0, 0.01, key="zoom_web")
-    with colXY1:
-        offset_x_web = st.slider("Website Pan X", -1.0, 1.0, 0.0, 0.01, key="offset_x_web")
-        offset_y_web = st.slider("Website Pan Y", -1.0, 1.0, 0.0, 0.01, key="offset_y_web")
-    hero = fit_image_with_offset(base_img, 1600, 900, zoom_web, offset_x_web, offset_y_web)
-    show_framed_image(hero, "Hero 1600×900 (website)", 1600, 900)
-    buf_h = io.BytesIO(); hero.save(buf_h, "JPEG", quality=92)
-    st.download_button("Download hero (JPEG)", data=buf_h.getvalue(), file_name="web_hero_1600x900.jpg", mime="image/jpeg")
-    copy_image_button("Copy website image", hero)
-    # Save website image as bytes in session_state
-    buf_h_png = io.BytesIO(); hero.save(buf_h_png, "PNG")
-    st.session_state["website_img"] = buf_h_png.getvalue()
-
-    st.subheader("Instagram Image (1080×1080)")
-    colZ2, colXY2 = st.columns([1,1])
-    with colZ2:
-        zoom_insta = st.slider("Instagram Zoom", 0.1, 3.0, 1.0, 0.01, key="zoom_insta")
-    with colXY2:
-        offset_x_insta = st.slider("Instagram Pan X", -1.0, 1.0, 0.0, 0.01, key="offset_x_insta")
-        offset_y_insta = st.slider("Instagram Pan Y", -1.0, 1.0, 0.0, 0.01, key="offset_y_insta")
-    insta = fit_image_with_offset(base_img, 1080, 1080, zoom_insta, offset_x_insta, offset_y_insta)
-    show_framed_image(insta, "Instagram 1080×1080", 1080, 1080)
-    buf_i = io.BytesIO(); insta.save(buf_i, "PNG")
-    st.download_button("Download Instagram (PNG)", data=buf_i.getvalue(), file_name="instagram_1080.png", mime="image/png")
-    copy_image_button("Copy Instagram image", insta)
-    # Save Instagram image as bytes in session_state
-    st.session_state["instagram_img"] = buf_i.getvalue()
+    render_html(html, component_height=60)
+
+DOWNLOAD_FORMATS = {"JPEG": 92, "PNG": None, "WEBP": 90}
+
+def export_panel(export_key, label, img_hash, frame_w, frame_h, params, default_fmt, file_stem, session_key, committed):
+    # Full-quality LANCZOS rendering only happens here, once per applied crop (or on request for the untouched crop)
+    export = st.session_state.get(export_key)
+    current = ("full", img_hash, frame_w, frame_h) + tuple(params)
+    if not (export and export["params"] == current) and (committed or st.button(f"Render full quality {label}", key=f"{export_key}_btn")):
+        # The render is kept as a PNG blob; session state holds its digest, not the decoded frame
+        with st.spinner(f"Rendering {label}..."):
+            # Same cache entry as the default crops written at upload (utils.renditions.store_default_crops)
+            png_data = render_crop(img_hash, frame_w, frame_h, params)
+        export = {"params": current, "png": blobs.store(st.session_state, session_key, png_data)}
+        st.session_state[export_key] = export
+    if export and export["params"] == current:
+        render = lambda: blobs.image(export["png"])
+        # PNG serves the clipboard button and the other pages; other formats are encoded only when selected
+        st.session_state[session_key] = export["png"]
+        png_data = blobs.load(st.session_state, session_key)
+        fmt = st.selectbox(f"Download format ({label})", list(DOWNLOAD_FORMATS), index=list(DOWNLOAD_FORMATS).index(default_fmt), key=f"{export_key}_fmt")
+        data = png_data if fmt == "PNG" else RENDITIONS.get_or_encode(current, render, fmt, DOWNLOAD_FORMATS[fmt])
+        ext = "jpg" if fmt == "JPEG" else fmt.lower()
+        st.download_button(f"Download {label} ({fmt})", data=data, file_name=f"{file_stem}.{ext}", mime=IMAGE_MIME_TYPES[fmt])
+        copy_image_button(f"Copy {label} image", png_data)
+
+CROP_PARAMS = (("zoom", 1.0), ("offset_x", 0.0), ("offset_y", 0.0))
+
+def crop_params(prefix):
+    return tuple(st.session_state.get(f"{name}_{prefix}", default) for name, default in CROP_PARAMS)
+
+def crop_editor_key(prefix, img_hash):
+    return f"crop_{prefix}_{img_hash[:16]}"
+
+@st.fragment
+@telemetry.timed("fragment.crop_panel")
+def crop_panel(title, prefix, img_hash, frame_w, frame_h, caption, export):
+    if telemetry.is_fragment_rerun():
+        # Reruns of just this panel skip the page's top-level setup
+        begin_payload_tracking()
+        telemetry.begin_rerun("Image Scaler · crop_panel")
+    st.subheader(title)
+    # A new upload starts from the default crop; the editor is keyed by the image, so it cannot return the old one
+    if st.session_state.get(f"crop_image_{prefix}") != img_hash:
+        for name, default in CROP_PARAMS:
+            st.session_state[f"{name}_{prefix}"] = default
+        st.session_state[f"crop_image_{prefix}"] = img_hash
+    # Dragging and zooming happen in the browser; the editor returns a value only when the crop is applied
+    params = crop_params(prefix)
+    applied = crop_editor(editor_source(img_hash), frame_w, frame_h, params, key=crop_editor_key(prefix, img_hash))
+    if applied is not None:
+        for (name, _), value in zip(CROP_PARAMS, applied):
+            st.session_state[f"{name}_{prefix}"] = value
+        params = applied
+    st.caption(f"{caption} – drag to pan, scroll or use the slider to zoom, then apply the crop.")
+    export_key, label, default_fmt, file_stem, session_key = export
+    export_panel(export_key, label, img_hash, frame_w, frame_h, params, default_fmt, file_stem, session_key, applied is not None)
+
+img_hash = st.session_state.get("source_blob")
+if img_hash and blobs.exists(img_hash):
+    blobs.retain(img_hash)
+    # Each crop panel is a fragment: applying a crop reruns only that panel, not the other format or the page
+    crop_panel("Website Hero Image (1600×900)", "web", img_hash, 1600, 900, "Hero 1600×900 (website)",
+               ("hero_export", "hero", "JPEG", "web_hero_1600x900", "website_blob"))
+    crop_panel("Instagram Image (1080×1080)", "insta", img_hash, 1080, 1080, "Instagram 1080×1080",
+               ("insta_export", "Instagram", "PNG", "instagram_1080", "instagram_blob"))
+
+    st.subheader("Batch Export (all formats)")
+    st.caption("Renders " + ", ".join(RENDITION_SIZES) + ". Web sizes use the website crop, Instagram sizes the Instagram crop.")
+    batch_formats = st.multiselect("Formats", list(EXPORT_FORMATS), default=list(EXPORT_FORMATS), key="batch_formats")
+    web_params, insta_params = crop_params("web"), crop_params("insta")
+    batch_params = (img_hash, web_params, insta_params, tuple(batch_formats))
+    if st.button("Export all renditions", key="batch_export_btn") and batch_formats:
+        try:
+            with st.spinner("Rendering all renditions..."):
+                zip_data, report = export_renditions(img_hash, {"web": web_params, "instagram": insta_params}, batch_formats)
+            st.session_state["batch_export"] = {"params": batch_params, "zip": blobs.put(zip_data), "report": report}
+        except Exception as exc:
+            st.error(f"Export failed: {exc}")
+    batch = st.session_state.get("batch_export")
+    if batch and batch["params"] == batch_params:
+        report = batch["report"]
+        blobs.retain(batch["zip"])
+        st.download_button("Download all renditions (ZIP)", data=blobs.get(batch["zip"]) or b"", file_name="renditions.zip", mime="application/zip")
+        slowest = max(report["renditions"].values())
+        st.caption(f"{len(report['renditions'])} sizes × {len(batch_formats)} formats in {report['total']:.1f}s on {report['workers']} workers (slowest single rendition: {slowest:.1f}s)")
+elif img_hash:
+    st.info("The uploaded image is no longer available. Please upload it again on the Project Setup page.")
 else:
-    st.info("No image uploaded. Please upload an image in the main page sidebar.")
\ No newline at end of file
+    st.info("No image uploaded. Please upload an image in the main page sidebar.")
+
+st.caption(payload_caption())
@@ -1,9 +1,14 @@
 import streamlit as st
 import textwrap
-import os
-import json
 import re
-import openai
+from utils import archive, blobs, data, jobs, telemetry
+from utils.media import begin_payload_tracking, image_url, payload_caption, render_html
+from utils.theme import page_header
+
+st.set_page_config(page_title="Website Content", page_icon="📰", layout="wide")
+begin_payload_tracking()
+telemetry.begin_rerun("Website Content")
+jobs.collect(st.session_state)
 
 def style_headline(text, font, size, color):
     return f'<div style="font-size:{size}px;font-weight:700;margin-bottom:0.2em;font-family:{font}, Century, Arial, sans-serif;color:{color};">{text}</div>'
@@ -18,47 +23,10 @@ def style_project_info_grid(items):
     grid_html += '</div>'
     return grid_html
 
-st.markdown("""
-<style>
-div.stButton > button {
-    background-color: #14532d !important; /* dark green fill */
-    color: white !important;
-    border: none !important;
-    border-radius: 6px !important;
-    padding: 0.5em 1.5em !important;
-    font-size: 1.08em !important;
-    font-weight: 600 !important;
-    transition: background 0.2s;
-}
-div.stButton > button:hover {
-    background-color: #d1d5db !important; /* lighter gray on hover */
-    color: #fff !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
 # (Removed duplicate/incomplete style_headline, style_body, and style_project_info_grid definitions)
-st.set_page_config(page_title="Website Content", page_icon="📰", layout="wide")
-st.markdown("""
-<h1 style='font-size:2.3em; color:#14532d; margin-bottom:0.5em;'>Website Content Generator</h1>
-<div style='font-size:1.15em; color:#222; margin-bottom:2em;'>Create and preview website headlines, body text, and project info for your architecture project.</div>
-""", unsafe_allow_html=True)
-
-STYLE_PATH = "data/website_styles.json"
-os.makedirs("data", exist_ok=True)
-
-def load_styles():
-    try:
-        with open(STYLE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-def save_styles(styles):
-    with open(STYLE_PATH, "w", encoding="utf-8") as f:
-        json.dump(styles, f, ensure_ascii=False, indent=2)
-
-styles = load_styles()
+page_header("Website Content Generator", "Create and preview website headlines, body text, and project info for your architecture project.")
+
+styles = data.get_website_styles()
 style_names = ["(new style)"] + sorted(styles.keys())
 
 FONT_OPTIONS = [
@@ -72,89 +40,71 @@ with st.sidebar:
     if chosen_style == "(new style)":
         style_name = st.text_input("Style name", "")
 
-    st.markdown("---")
-    st.subheader("Headline Style")
-    headline_font = st.selectbox("Headline Font Family", FONT_OPTIONS, index=FONT_OPTIONS.index("Century Gothic") if "Century Gothic" in FONT_OPTIONS else 0, key="headline_font")
-    headline_size = st.slider("Headline Font Size", min_value=18, max_value=48, value=32, step=1, key="headline_size")
-    headline_color = st.color_picker("Headline Color", value="#222222", key="headline_color")
-
-    st.markdown("---")
-    st.subheader("Body Style")
-    body_font = st.selectbox("Body Font Family", FONT_OPTIONS, index=FONT_OPTIONS.index("Century Gothic") if "Century Gothic" in FONT_OPTIONS else 0, key="body_font")
-    body_size = st.slider("Body Font Size", min_value=12, max_value=32, value=18, step=1, key="body_size")
-    body_color = st.color_picker("Body Color", value="#222222", key="body_color")
-
-web_content = st.session_state.get("web", None)
-website_img_bytes = st.session_state.get("website_img", None)
-
-if web_content:
-    title = web_content.get("title", "")
-    # Remove 'Headline:' prefix if present
-    if title.lower().startswith('headline:'):
-        title = title[len('headline:'):].strip()
-    sections = web_content.get("sections", [])
-    # Combine all section bodies into one text
-    full_body = " ".join([sec.get("body","") for sec in sections]).strip()
+# --- Content Archive ---
+def load_archived_web(entry_id):
+    entry = archive.get(entry_id)
+    if entry:
+        st.session_state["web"] = entry["output"]
+        st.session_state["active_project"] = entry["inputs"].get("project", {})
+
+with st.expander("Content archive – search and reload earlier articles"):
+    archive_projects, archive_styles = data.get_archive_facets("web")
+    col_q, col_p, col_s = st.columns([2, 1, 1])
+    archive_query = col_q.text_input("Search headlines and articles", key="archive_query")
+    archive_project = col_p.selectbox("Project", ["(all)"] + archive_projects, key="archive_project")
+    archive_style = col_s.selectbox("Style", ["(all)"] + archive_styles, key="archive_style")
+    entries = data.search_archive(
+        archive_query,
+        project=None if archive_project == "(all)" else archive_project,
+        style=None if archive_style == "(all)" else archive_style,
+        kind="web",
+        limit=20,
+    )
+    if not entries:
+        st.caption("No archived articles found.")
+    for entry in entries:
+        col_info, col_load = st.columns([5, 1])
+        col_info.markdown(f"**{archive.format_entry(entry)}**  \n{entry['snippet']}")
+        col_load.button("Load", key=f"archive_load_{entry['id']}", on_click=load_archived_web, args=(entry["id"],))
+
+# --- Previews ---
+# Text style controls and the three previews form one fragment: a font, size or colour change reruns only
+# the previews, not the archive search, project lookup and page chrome above
+@st.fragment
+@telemetry.timed("fragment.website_previews")
+def website_previews(web_content, info_items):
+    if telemetry.is_fragment_rerun():
+        # Reruns of just this panel skip the page's top-level setup
+        begin_payload_tracking()
+        telemetry.begin_rerun("Website Content · website_previews")
+    with st.expander("Text style", expanded=True):
+        col_headline, col_body = st.columns(2)
+        with col_headline:
+            st.subheader("Headline Style")
+            headline_font = st.selectbox("Headline Font Family", FONT_OPTIONS, index=FONT_OPTIONS.index("Century Gothic") if "Century Gothic" in FONT_OPTIONS else 0, key="headline_font")
+            headline_size = st.slider("Headline Font Size", min_value=18, max_value=48, value=32, step=1, key="headline_size")
+            headline_color = st.color_picker("Headline Color", value="#222222", key="headline_color")
+        with col_body:
+            st.subheader("Body Style")
+            body_font = st.selectbox("Body Font Family", FONT_OPTIONS, index=FONT_OPTIONS.index("Century Gothic") if "Century Gothic" in FONT_OPTIONS else 0, key="body_font")
+            body_size = st.slider("Body Font Size", min_value=12, max_value=32, value=18, step=1, key="body_size")
+            body_color = st.color_picker("Body Color", value="#222222", key="body_color")
+
+    website_img_bytes = blobs.load(st.session_state, "website_blob")
     preview_map = {
         "Short Preview": "short",
         "Medium Preview": "medium",
         "Long Preview": "long"
     }
-    # Prepare project info for grid
-    project = st.session_state.get("active_project", {})
-    if not project or not project.get("name"):
-        # Fallback: use the most recently saved project from PROJECTS
-        try:
-            with open("data/projects.json", "r", encoding="utf-8") as f:
-                projects = json.load(f)
-            if projects:
-                # Use the last project in the dict
-                last_proj = list(projects.values())[-1]
-                project = last_proj
-        except Exception:
-            project = {}
-    name = project.get("name", "")
-    client = project.get("client", "")
-    location = project.get("location", "")
-    ptype = project.get("type", "")
-    size = project.get("size_scope", "")
-    timeline = project.get("timeline", "")
-    phase = project.get("phase", "")
-    firms = project.get("architectural_firm", [])
-    office_str = ", ".join(firms) if firms else ""
-
     for label, key in preview_map.items():
         st.markdown(f"### {label}")
         col_img, col_text = st.columns([1,2])
         with col_img:
             if website_img_bytes:
-                import base64
-                img_data = base64.b64encode(website_img_bytes).decode()
-                st.markdown(f"<img src='data:image/png;base64,{img_data}' style='width:100%;max-width:320px;border-radius:16px;box-shadow:0 2px 12px #0002;margin-bottom:1em;'>", unsafe_allow_html=True)
+                render_html(f"<img src='{image_url(website_img_bytes)}' style='width:100%;max-width:320px;border-radius:16px;box-shadow:0 2px 12px #0002;margin-bottom:1em;'>")
             else:
                 st.markdown("<div style='width:100%;height:180px;background:#eee;border-radius:16px;display:flex;align-items:center;justify-content:center;color:#aaa;font-size:1.2em;'>No Image</div>", unsafe_allow_html=True)
         with col_text:
-            # Ensure project info fallback is applied for each preview
-            project = st.session_state.get("active_project", {})
-            if not project or not project.get("name"):
-                try:
-                    with open("data/projects.json", "r", encoding="utf-8") as f:
-                        projects = json.load(f)
-                    if projects:
-                        last_proj = list(projects.values())[-1]
-                        project = last_proj
-                except Exception:
-                    project = {}
-            name = project.get("name", "")
-            client = project.get("client", "")
-            location = project.get("location", "")
-            ptype = project.get("type", "")
-            size = project.get("size_scope", "")
-            timeline = project.get("timeline", "")
-            phase = project.get("phase", "")
-            firms = project.get("architectural_firm", [])
-            office_str = ", ".join(firms) if firms else ""
-
             preview_data = web_content.get(key, {})
             headline_text = preview_data.get("title", "")
             # Remove 'Headline:' prefix if present
@@ -170,16 +120,7 @@ if web_content:
             preview_html = (
                 '<div style="background:#fff;padding:2em;border-radius:12px;box-shadow:0 2px 12px #0002;max-width:800px;margin:left;">'
                 + style_headline(headline_text, headline_font, headline_size, headline_color)
-                + style_project_info_grid([
-                    ("Project", name),
-                    ("Client", client),
-                    ("Location", location),
-                    ("Architectural Office", office_str),
-                    ("Type", ptype),
-                    ("Size", size),
-                    ("Timeline", timeline),
-                    ("Phase", phase)
-                ])
+                + style_project_info_grid(info_items)
                 + style_body(body_text, body_font, body_size, body_color)
                 + '</div>'
             )
@@ -196,8 +137,41 @@ if web_content:
                 mime="text/html"
             )
 
+jobs.watch("web", "Website content is still being generated; the previews update when it is done.")
+web_content = st.session_state.get("web", None)
+
+if web_content:
+    title = web_content.get("title", "")
+    # Remove 'Headline:' prefix if present
+    if title.lower().startswith('headline:'):
+        title = title[len('headline:'):].strip()
+    sections = web_content.get("sections", [])
+    # Combine all section bodies into one text
+    full_body = " ".join([sec.get("body","") for sec in sections]).strip()
+    # Prepare project info for grid
+    project = st.session_state.get("active_project", {})
+    if not project or not project.get("name"):
+        # Fallback: use the most recently saved project
+        try:
+            project = data.get_last_project()
+        except Exception:
+            project = {}
+    firms = project.get("architectural_firm", [])
+    info_items = [
+        ("Project", project.get("name", "")),
+        ("Client", project.get("client", "")),
+        ("Location", project.get("location", "")),
+        ("Architectural Office", ", ".join(firms) if firms else ""),
+        ("Type", project.get("type", "")),
+        ("Size", project.get("size_scope", "")),
+        ("Timeline", project.get("timeline", "")),
+        ("Phase", project.get("phase", ""))
+    ]
+    website_previews(web_content, info_items)
 
 
 # If no web_content, show info message
 if not web_content:
-    st.info("No website content found. Please generate content from the Project Setup page.")
\ No newline at end of file
+    st.info("No website content found. Please generate content from the Project Setup page.")
+else:
+    st.caption(payload_caption())
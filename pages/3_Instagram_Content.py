@@ -1,59 +1,65 @@
 import streamlit as st
-import openai
-from PIL import Image
-import io
+import hashlib
+from utils.generation import generate_caption, generate_hashtags
+from utils.llm_cache import cache_stats_caption, format_stream_metrics
+from utils import archive, blobs, data, jobs, pipeline, telemetry
+from utils.media import begin_payload_tracking, image_url, payload_caption, render_html
+from utils.prompts import caption_source
+from utils.theme import page_header
 
 st.set_page_config(page_title="Instagram Content", page_icon="📸", layout="wide")
-st.markdown("""
-<h1 style='font-size:2.3em; color:#14532d; margin-bottom:0.5em;'>Instagram Content Generator</h1>
-<div style='font-size:1.15em; color:#222; margin-bottom:2em;'>Create and preview Instagram captions, images, and hashtags for your project.</div>
-""", unsafe_allow_html=True)
-import base64
+begin_payload_tracking()
+telemetry.begin_rerun("Instagram Content")
+jobs.collect(st.session_state)
+page_header("Instagram Content Generator", "Create and preview Instagram captions, images, and hashtags for your project.")
+jobs.watch("web", "Website content is still being generated; captions and hashtags follow once it is done.")
+jobs.watch("social", "Writing all caption lengths and the hashtags.")
 
-st.markdown("""
-<style>
-div.stButton > button {
-    background-color: #14532d !important; /* dark green fill */
-    color: white !important;
-    border: none !important;
-    border-radius: 6px !important;
-    padding: 0.5em 1.5em !important;
-    font-size: 1.08em !important;
-    font-weight: 600 !important;
-    transition: background 0.2s;
-}
-div.stButton > button:hover {
-    background-color: #d1d5db !important; /* lighter gray on hover */
-    color: #fff !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
-# Example initialization for img_bytes and col_right
-img_bytes = b""  # Replace with actual image bytes as needed
-img_data = base64.b64encode(img_bytes).decode()
-
-col_left, col_right = st.columns([1, 2])
-
-with col_left:
-    st.markdown("### Instagram Image – Live Preview")
-    img_bytes = st.session_state.get("instagram_img", None)
-    img_box_style = "background:#fff;max-width:320px;width:320px;height:320px;margin:auto;border-radius:18px;box-shadow:0 2px 12px #0002;display:flex;align-items:center;justify-content:center;padding:0;margin-bottom:1.2em;"
-    if img_bytes:
-        import base64
-        img_data = base64.b64encode(img_bytes).decode()
-        st.markdown(f"""
-            <div style='{img_box_style}'>
-                <img src='data:image/png;base64,{img_data}' style='width:100%;height:100%;object-fit:cover;border-radius:18px;'>
-            </div>
-        """, unsafe_allow_html=True)
+# --- Hashtags ---
+# The hashtag preview, its request and the custom hashtag controls form one fragment: ticking or adding
+# a hashtag reruns only this panel, not the caption controls or the image preview
+@st.fragment
+@telemetry.timed("fragment.hashtag_panel")
+def hashtag_panel():
+    if telemetry.is_fragment_rerun():
+        # Reruns of just this panel skip the page's top-level setup
+        begin_payload_tracking()
+        telemetry.begin_rerun("Instagram Content · hashtag_panel")
+    st.markdown("### Hashtags Preview")
+    web_content = st.session_state.get("web", None)
+    hashtags = ""
+    auto_hashtags = []
+    if web_content is not None:
+        source_text = caption_source(web_content)
+        # Use OpenAI to generate hashtags, only when the article changed or a regeneration was requested
+        if source_text:
+            text_hash = hashlib.sha256(source_text.encode("utf-8")).hexdigest()
+            regenerate = st.session_state.pop("regenerate_hashtags", False)
+            # A running content set job writes the hashtags itself
+            if (regenerate or st.session_state.get("auto_hashtags_hash") != text_hash) and not jobs.pending(st.session_state):
+                try:
+                    with telemetry.span("hashtags"):
+                        st.session_state["auto_hashtags"] = generate_hashtags(source_text, force=regenerate)
+                    st.session_state.pop("auto_hashtags_error", None)
+                except Exception as e:
+                    st.session_state["auto_hashtags"] = []
+                    st.session_state["auto_hashtags_error"] = str(e)
+                # Remember the input even on failure so the next rerun doesn't retry; use "Regenerate hashtags" instead
+                st.session_state["auto_hashtags_hash"] = text_hash
+            auto_hashtags = st.session_state.get("auto_hashtags", [])
+    custom_hashtags = st.session_state.get("custom_hashtags", ["#architecture", "#design"])
+    ticked_hashtags = [tag for tag in custom_hashtags if st.session_state.get(f"hashtag_{tag}", False)]
+    # Only show ticked custom hashtags, and 15 auto hashtags
+    all_hashtags = auto_hashtags + ticked_hashtags
+    if all_hashtags:
+        hashtags = " ".join(all_hashtags)
     else:
-        st.markdown(f"<div style='{img_box_style}color:#aaa;font-size:1.2em;'>No Image</div>", unsafe_allow_html=True)
-
-    st.markdown("### Caption Preview")
-    clean_caption = st.session_state.get("generated_caption", "")
+        hashtags = "No hashtags generated. Please check your website content or select custom hashtags."
+    st.session_state["generated_hashtags"] = hashtags
     st.markdown(f'''
         <div style="
+            background:#fff;
+            min-height:80px;
             max-width:320px;
             margin:auto;
             border-radius:18px;
@@ -74,57 +80,58 @@ with col_left:
                 width:100%;
                 word-break:break-word;
             ">
-                {clean_caption}
+                {hashtags}
             </div>
         </div>
     ''', unsafe_allow_html=True)
     st.markdown("<div style='height: 1.5em'></div>", unsafe_allow_html=True)
     st.download_button(
-        label="Download Caption",
-        data=clean_caption,
-        file_name="caption.txt",
+        label="Download Hashtags",
+        data=hashtags,
+        file_name="hashtags.txt",
         mime="text/plain",
-        key="download_caption"
+        key="download_hashtags"
     )
-    st.markdown("<div style='height: 2em'></div>", unsafe_allow_html=True)
-
-    st.markdown("### Hashtags Preview")
-    web_content = st.session_state.get("web", None)
-    hashtags = ""
-    auto_hashtags = []
     if web_content is not None:
-        long_preview = web_content.get("long", {})
-        long_text = long_preview.get("title", "")
-        sections = long_preview.get("sections", [])
-        if sections and isinstance(sections[0], dict):
-            long_text += " " + sections[0].get("body", "")
-        # Use OpenAI to generate hashtags
-        if long_text.strip():
-            prompt = f"Generate 15 relevant hashtags for the following Instagram post:\n{long_text}\nOnly output hashtags separated by spaces."
-            try:
-                response = openai.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=150,
-                    temperature=0.7
-                )
-                hashtags_text = response.choices[0].message.content.strip()
-                auto_hashtags = [tag for tag in hashtags_text.split() if tag.startswith("#")][:15]
-            except Exception as e:
-                auto_hashtags = []
-    custom_hashtags = st.session_state.get("custom_hashtags", ["#architecture", "#design"])
-    ticked_hashtags = [tag for tag in custom_hashtags if st.session_state.get(f"hashtag_{tag}", False)]
-    # Only show ticked custom hashtags, and 15 auto hashtags
-    all_hashtags = auto_hashtags + ticked_hashtags
-    if all_hashtags:
-        hashtags = " ".join(all_hashtags)
+        st.button("Regenerate hashtags", key="regenerate_hashtags_btn", on_click=lambda: st.session_state.update(regenerate_hashtags=True))
+        if st.session_state.get("auto_hashtags_error"):
+            st.caption(f"[Error generating hashtags: {st.session_state['auto_hashtags_error']}]")
+
+    st.markdown("#### Add custom hashtags to list")
+    new_hashtag = st.text_input("Add custom hashtag", "", key="new_hashtag")
+    if st.button("Add hashtag", key="add_hashtag_btn"):
+        if new_hashtag and new_hashtag not in custom_hashtags:
+            # The checkboxes below pick up the new tag in this same run
+            custom_hashtags.append(new_hashtag)
+            st.session_state["custom_hashtags"] = custom_hashtags
+
+    st.markdown("#### Select hashtags to include")
+    selected_hashtags = []
+    for tag in custom_hashtags:
+        if st.checkbox(tag, key=f"hashtag_{tag}"):
+            selected_hashtags.append(tag)
+    st.session_state["selected_hashtags"] = selected_hashtags
+
+
+col_left, col_right = st.columns([1, 2])
+
+with col_left:
+    st.markdown("### Instagram Image – Live Preview")
+    img_bytes = blobs.load(st.session_state, "instagram_blob")
+    img_box_style = "background:#fff;max-width:320px;width:320px;height:320px;margin:auto;border-radius:18px;box-shadow:0 2px 12px #0002;display:flex;align-items:center;justify-content:center;padding:0;margin-bottom:1.2em;"
+    if img_bytes:
+        render_html(f"""
+            <div style='{img_box_style}'>
+                <img src='{image_url(img_bytes)}' style='width:100%;height:100%;object-fit:cover;border-radius:18px;'>
+            </div>
+        """)
     else:
-        hashtags = "No hashtags generated. Please check your website content or select custom hashtags."
-    st.session_state["generated_hashtags"] = hashtags
+        st.markdown(f"<div style='{img_box_style}color:#aaa;font-size:1.2em;'>No Image</div>", unsafe_allow_html=True)
+
+    st.markdown("### Caption Preview")
+    clean_caption = st.session_state.get("generated_caption", "")
     st.markdown(f'''
         <div style="
-            background:#fff;
-            min-height:80px;
             max-width:320px;
             margin:auto;
             border-radius:18px;
@@ -145,18 +152,21 @@ with col_left:
                 width:100%;
                 word-break:break-word;
             ">
-                {hashtags}
+                {clean_caption}
             </div>
         </div>
     ''', unsafe_allow_html=True)
     st.markdown("<div style='height: 1.5em'></div>", unsafe_allow_html=True)
     st.download_button(
-        label="Download Hashtags",
-        data=hashtags,
-        file_name="hashtags.txt",
+        label="Download Caption",
+        data=clean_caption,
+        file_name="caption.txt",
         mime="text/plain",
-        key="download_hashtags"
+        key="download_caption"
     )
+    st.markdown("<div style='height: 2em'></div>", unsafe_allow_html=True)
+
+    hashtag_panel()
 
 with col_right:
     # Controls and customization
@@ -165,46 +175,63 @@ with col_right:
     def auto_generate_caption(length):
         web = st.session_state.get("web", None)
         if web is not None:
-            long_preview = web.get("long", {})
-            website_text = long_preview.get("title", "")
-            sections = long_preview.get("sections", [])
-            if sections and isinstance(sections[0], dict):
-                website_text += " " + sections[0].get("body", "")
-            website_text = website_text.strip()
+            website_text = caption_source(web)
             all_endings = st.session_state.get("caption_endings", ["www.scherzer-architekten.de", "Photo: Max Mustermann"])
             ticked_endings = [e for e in all_endings if st.session_state.get(f"ending_{e}", False)]
             caption_style = st.session_state.get("caption_style", "neutral")
+            metrics = None
             if not website_text:
                 main_caption = "[No website content available. Please generate website content first.]"
             else:
-                prompt = f"""
-You are an expert social media copywriter. Write an Instagram caption for the following architecture project, using the given style/tone and length. Do NOT repeat the website headline. Make it engaging and suitable for Instagram.
-
-Project text:
-{website_text}
+                streamed = []
 
-Style/Tone: {caption_style}
-Length: {length} characters
-
-Only output the caption text, no hashtags, no headline.
-"""
-                try:
-                    response = openai.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=length+50,
-                        temperature=0.7
-                    )
-                    main_caption = response.choices[0].message.content.strip()
-                except Exception as exc:
-                    main_caption = f"[Error generating caption: {exc}]"
+                def stream_token(text):
+                    streamed.append(text)
+                    placeholder.markdown("".join(streamed))
+                on_token = stream_token if st.session_state.get("stream_caption", True) else None
+                placeholder = st.empty() if on_token else None
+                with telemetry.span("auto_generate_caption", length=length):
+                    try:
+                        metrics = {}
+                        main_caption = generate_caption(website_text, caption_style, length,
+                                                        st.session_state.get("insta_force_regenerate", False), on_token, metrics)
+                        st.session_state["caption_stream_metrics"] = metrics if on_token else {}
+                    except Exception as exc:
+                        metrics = None
+                        main_caption = f"[Error generating caption: {exc}]"
             # Append only ticked endings, each on a new line
             if ticked_endings:
                 main_caption += "\n" + "\n".join(ticked_endings)
+            if metrics is not None:
+                project_name = st.session_state.get("active_project", {}).get("name", "")
+                archive.record_caption(project_name, main_caption, length, caption_style, website_text, metrics)
             st.session_state["generated_caption"] = main_caption
             st.session_state["caption_length"] = length
             st.rerun()
 
+    def generate_content_set():
+        # All caption lengths and the hashtags at once, as one background job (see utils.pipeline)
+        web = st.session_state.get("web", None)
+        if web is None:
+            st.warning("Please generate website content first.")
+            return
+        project = st.session_state.get("active_project", {})
+        tone = st.session_state.get("caption_style", "neutral")
+        all_endings = st.session_state.get("caption_endings", ["www.scherzer-architekten.de", "Photo: Max Mustermann"])
+        endings = [e for e in all_endings if st.session_state.get(f"ending_{e}", False)]
+        force = st.session_state.get("insta_force_regenerate", False)
+        key = jobs.input_key("social", source=caption_source(web), tone=tone, endings=endings, force=force)
+        job_id, _ = jobs.submit("social", key, pipeline.content_set_job, project, [], "", {}, None, None, "", tone, endings, force, False,
+                                web=web, label=project.get("name", ""))
+        jobs.track(st.session_state, job_id)
+        st.rerun()
+
+    def load_archived_caption(entry_id):
+        entry = archive.get(entry_id)
+        if entry:
+            st.session_state["generated_caption"] = entry["output"]
+            st.session_state["caption_length"] = entry["inputs"].get("length")
+
     with st.container():
         if col_len1.button("Short 80", key="caption_len_short"):
             auto_generate_caption(80)
@@ -212,7 +239,25 @@ Only output the caption text, no hashtags, no headline.
             auto_generate_caption(200)
         if col_len3.button("Long 400", key="caption_len_long"):
             auto_generate_caption(400)
-            auto_generate_caption(400)
+        if st.button("All lengths + hashtags", key="caption_content_set"):
+            generate_content_set()
+    st.checkbox("Force regenerate (skip response cache)", value=False, key="insta_force_regenerate")
+    st.checkbox("Stream caption while generating", value=True, key="stream_caption")
+    if st.session_state.get("caption_stream_metrics"):
+        st.caption(f"Last caption – {format_stream_metrics(st.session_state['caption_stream_metrics'])}")
+    if st.session_state.get("pipeline_timings"):
+        st.caption(f"Last content set – {pipeline.format_timings(st.session_state['pipeline_timings'])}")
+    job_error = st.session_state.pop("social_job_error", None)
+    if job_error:
+        st.error(f"Error generating captions: {job_error}")
+    st.caption(cache_stats_caption())
+    st.caption(payload_caption())
+    with st.expander("Caption archive – search and reload earlier captions"):
+        archive_query = st.text_input("Search captions", key="caption_archive_query")
+        for entry in data.search_archive(archive_query, kind="caption", limit=20):
+            st.markdown(f"**{archive.format_entry(entry)}**  \n{entry['snippet']}")
+            st.button("Load caption", key=f"caption_archive_load_{entry['id']}", on_click=load_archived_caption, args=(entry["id"],))
+
     # 1. Caption Style
     st.markdown("#### Choose Caption Style/Tone")
     caption_styles = ["neutral", "enthusiastic", "conversational", "formal"]
@@ -235,28 +280,3 @@ Only output the caption text, no hashtags, no headline.
             endings.append(new_ending)
             st.session_state["caption_endings"] = endings
             st.rerun()
-
-    # 4. Custom Hashtags
-    st.markdown("---")
-    st.markdown("#### Add custom hashtags to list")
-    custom_hashtags = st.session_state.get("custom_hashtags", ["#architecture", "#design"])
-    selected_hashtags = st.session_state.get("selected_hashtags", [])
-    new_hashtag = st.text_input("Add custom hashtag", "", key="new_hashtag")
-    if st.button("Add hashtag", key="add_hashtag_btn"):
-        if new_hashtag and new_hashtag not in custom_hashtags:
-            custom_hashtags.append(new_hashtag)
-            st.session_state["custom_hashtags"] = custom_hashtags
-            st.rerun()
-
-    st.markdown("#### Select hashtags to include")
-    selected_hashtags = []
-    for tag in custom_hashtags:
-        if st.checkbox(tag, key=f"hashtag_{tag}"):
-            selected_hashtags.append(tag)
-    st.session_state["selected_hashtags"] = selected_hashtags
-
-
-
-
-
-
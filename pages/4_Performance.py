@@ -0,0 +1,74 @@
+import streamlit as st
+import os
+import time
+from utils import blobs, telemetry
+from utils.llm_cache import cache_stats_caption
+from utils.theme import page_header
+
+st.set_page_config(page_title="Performance", page_icon="📈", layout="wide")
+page_header("Performance", "Where the time goes: OpenAI calls, image processing and data loads per rerun, with token usage and rendered bytes.")
+
+# --- Scope ---
+col_scope, col_clear = st.columns([3, 1])
+only_session = col_scope.checkbox("Only my session", value=True, key="perf_only_session")
+if col_clear.button("Clear metrics", key="perf_clear_btn"):
+    telemetry.clear()
+session = telemetry.session_id() if only_session else None
+
+# --- Reruns ---
+st.header("Recent reruns")
+runs = telemetry.recent_runs(session, limit=50)
+if runs:
+    st.dataframe([
+        {
+            "time": time.strftime("%H:%M:%S", time.localtime(run["started"])),
+            "page": run["page"],
+            "OpenAI ms": run["span_ms"].get("llm.chat_completion", 0),
+            "image ms": round(run["span_ms"].get("fit_image_with_offset", 0) + run["span_ms"].get("encode_image", 0), 1),
+            "data load ms": run["span_ms"].get("data.load", 0),
+            "tokens": run["counters"].get("tokens", 0),
+            "image markup KB": round(run["counters"].get("bytes_rendered", 0) / 1024, 1),
+            "data cache hits": run["counters"].get("data_cache_hits", 0),
+        }
+        for run in runs
+    ], use_container_width=True, hide_index=True)
+    st.caption("OpenAI ms adds up all requests of a rerun; parallel requests overlap, so it can exceed the wall-clock time.")
+else:
+    st.info("No reruns recorded yet. Use the other pages, then come back here.")
+
+# --- Span statistics ---
+st.header("Span statistics")
+stats = telemetry.span_stats(session)
+if stats:
+    st.dataframe([{"span": name, **values} for name, values in stats.items()], use_container_width=True, hide_index=True)
+st.caption(cache_stats_caption())
+blob_stats = blobs.stats()
+st.caption(f"Blob store – {blob_stats['blobs']} blobs ({blob_stats['bytes'] / 1024 / 1024:.1f} MB on disk) · "
+           f"decoded image cache: {blob_stats['decoded']} images ({blob_stats['decoded_bytes'] / 1024 / 1024:.0f} MB)")
+
+st.subheader("Slowest recent spans")
+spans = sorted(telemetry.recent_spans(session, limit=500), key=lambda s: -s["ms"])[:20]
+if spans:
+    st.dataframe([
+        {
+            "time": time.strftime("%H:%M:%S", time.localtime(s["ts"])),
+            "span": s["name"],
+            "ms": s["ms"],
+            "page": s["page"] or "",
+            "details": ", ".join(f"{k}={v}" for k, v in s["attrs"].items()),
+            "error": s["error"] or "",
+        }
+        for s in spans
+    ], use_container_width=True, hide_index=True)
+
+# --- JSON log ---
+st.header("JSON log")
+log_path = telemetry.LOG_PATH
+if log_path and os.path.exists(log_path):
+    st.caption(f"{log_path} – {os.path.getsize(log_path) / 1024:.0f} KB, one JSON object per line (type span or rerun).")
+    with open(log_path, "rb") as f:
+        # The newest 2 MB are enough for a look; scrapers read the file directly
+        f.seek(max(0, os.path.getsize(log_path) - 2 * 1024 * 1024))
+        st.download_button("Download log (latest 2 MB)", data=f.read(), file_name="metrics.jsonl", mime="application/x-ndjson")
+else:
+    st.caption("The JSON log is disabled (ARCHINEWS_METRICS_LOG is empty) or has no entries yet.")
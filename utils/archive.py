@@ -0,0 +1,150 @@
+# Archive of generated website articles and Instagram captions.
+# Every output is stored in the SQLite store together with its inputs, model, token usage and timestamp,
+# and indexed with FTS5 so earlier headlines, bodies and captions can be found by keyword, project or style
+# and loaded back into the pages without another API call.
+
+import hashlib
+import json
+import threading
+import time
+
+from utils import store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    project TEXT NOT NULL DEFAULT '',
+    style TEXT NOT NULL DEFAULT '',
+    mode TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    inputs TEXT NOT NULL,
+    output TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    digest TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_project ON archive(project, created_at);
+CREATE INDEX IF NOT EXISTS idx_archive_style ON archive(style, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5(
+    project, style, title, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect():
+    conn = store.connect()
+    with _schema_lock:
+        if store.DB_PATH not in _schema_ready:
+            conn.executescript(SCHEMA)
+            _schema_ready.add(store.DB_PATH)
+    return conn
+
+
+def _sum_usage(metrics, field):
+    values = [m.get(field) for m in metrics.values() if m.get(field) is not None]
+    return sum(values) if values else None
+
+
+def _record(kind, project, style, mode, inputs, output, title, body, metrics):
+    # metrics maps request label -> metrics dict from llm_cache; cache hits count as 0 tokens
+    metrics = metrics or {}
+    models = sorted({m["model"] for m in metrics.values() if m.get("model")})
+    output_json = json.dumps(output, ensure_ascii=False)
+    # The same output for the same project and style (e.g. a cache hit) is stored only once
+    digest = hashlib.sha256(json.dumps([kind, project, style, output_json]).encode("utf-8")).hexdigest()
+    conn = _connect()
+    with store.transaction(conn):
+        row = conn.execute("SELECT id FROM archive WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            return row["id"]
+        cursor = conn.execute(
+            "INSERT INTO archive (kind, project, style, mode, model, inputs, output, prompt_tokens, completion_tokens, "
+            "total_tokens, digest, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, project, style, mode, ", ".join(models), json.dumps(inputs, ensure_ascii=False), output_json,
+             _sum_usage(metrics, "prompt_tokens"), _sum_usage(metrics, "completion_tokens"),
+             _sum_usage(metrics, "total_tokens"), digest, time.time()),
+        )
+        conn.execute("INSERT INTO archive_fts (rowid, project, style, title, body) VALUES (?, ?, ?, ?, ?)",
+                     (cursor.lastrowid, project, style, title, body))
+        return cursor.lastrowid
+
+
+def record_web(project, usps, style_name, style, mode, results, metrics=None, image_hash=None):
+    """Archive one generate_text result ({label: {"title", "sections"}}); returns the entry id."""
+    titles = [article.get("title", "") for article in results.values()]
+    bodies = [section.get("body", "") for article in results.values() for section in article.get("sections", [])]
+    inputs = {"project": project, "usps": list(usps), "style": style, "image_hash": image_hash}
+    return _record("web", project.get("name", ""), style_name or "", mode, inputs, results,
+                   "\n".join(titles), "\n\n".join(bodies), metrics)
+
+
+def record_caption(project_name, caption, length, tone, source_text, metrics=None):
+    """Archive one Instagram caption; returns the entry id."""
+    inputs = {"length": length, "tone": tone, "source_text": source_text}
+    return _record("caption", project_name or "", tone, str(length), inputs, caption, "", caption,
+                   {"caption": metrics} if metrics else None)
+
+
+def _match_query(text):
+    # Every word is quoted (so FTS5 syntax characters are taken literally) and matched as a prefix
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+def search(text="", project=None, style=None, kind=None, limit=50):
+    """Newest-first (or best match first, when text is given) archive entries without their full output."""
+    conn = _connect()
+    where, params = [], []
+    for column, value in (("a.project", project), ("a.style", style), ("a.kind", kind)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    query = _match_query(text)
+    if query:
+        sql = ("SELECT a.id, a.kind, a.project, a.style, a.mode, a.model, a.total_tokens, a.created_at, "
+               "snippet(archive_fts, -1, '**', '**', '…', 16) AS snippet "
+               "FROM archive_fts JOIN archive a ON a.id = archive_fts.rowid WHERE archive_fts MATCH ?")
+        params.insert(0, query)
+        order = "ORDER BY archive_fts.rank"
+    else:
+        sql = ("SELECT a.id, a.kind, a.project, a.style, a.mode, a.model, a.total_tokens, a.created_at, "
+               "substr(trim(f.title || ' ' || f.body), 1, 160) AS snippet "
+               "FROM archive a JOIN archive_fts f ON f.rowid = a.id WHERE 1")
+        order = "ORDER BY a.created_at DESC"
+    if where:
+        sql += " AND " + " AND ".join(where)
+    sql += f" {order} LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def get(entry_id):
+    """One archive entry with its inputs and output decoded, or None."""
+    row = _connect().execute("SELECT * FROM archive WHERE id = ?", (entry_id,)).fetchone()
+    if row is None:
+        return None
+    entry = dict(row)
+    entry["inputs"] = json.loads(entry["inputs"])
+    entry["output"] = json.loads(entry["output"])
+    return entry
+
+
+def facets(kind=None):
+    """Distinct project and style names in the archive, for filter dropdowns."""
+    conn = _connect()
+    clause, params = ("WHERE kind = ?", (kind,)) if kind else ("", ())
+    projects = [r[0] for r in conn.execute(f"SELECT DISTINCT project FROM archive {clause} ORDER BY project", params) if r[0]]
+    styles = [r[0] for r in conn.execute(f"SELECT DISTINCT style FROM archive {clause} ORDER BY style", params) if r[0]]
+    return projects, styles
+
+
+def format_entry(entry):
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created_at"]))
+    tokens = f" · {entry['total_tokens']} tokens" if entry.get("total_tokens") is not None else ""
+    return f"{created} · {entry['project'] or '(no project)'} · {entry['style'] or '–'} · {entry['model'] or '–'}{tokens}"
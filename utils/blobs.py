@@ -0,0 +1,205 @@
+# Content-addressed blob store for images and exports.
+# Uploads, rendered frames and export archives are written once to BLOB_DIR under their SHA-256 digest; session
+# state only holds the digests. Bytes are read back from disk when a page needs them, and decoded images
+# are shared by all sessions through one LRU bounded by pixel memory instead of one copy per session.
+# Sessions register the digests they hold; collect_garbage() deletes blobs no live session references,
+# once they are older than GC_GRACE (so blobs of a job still running or a just-restarted server survive).
+
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+BLOB_DIR = os.getenv("ARCHINEWS_BLOB_DIR", "data/blobs")
+DECODED_CACHE_BYTES = int(os.getenv("ARCHINEWS_DECODED_CACHE_MB", "256")) * 1024 * 1024
+GC_GRACE = 3600
+GC_INTERVAL = 600
+
+_refs = {}
+_refs_lock = threading.Lock()
+_last_gc = 0.0
+
+
+def _path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def put(data):
+    """Store bytes once under their SHA-256 digest and return the digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    _maybe_collect()
+    return digest
+
+
+def get(digest):
+    """The blob's bytes, or None when it does not exist (e.g. collected after its session ended)."""
+    if not digest:
+        return None
+    try:
+        with open(_path(digest), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def exists(digest):
+    return bool(digest) and os.path.exists(_path(digest))
+
+
+# --- Session references ---
+def _session_id():
+    from utils import telemetry
+    return telemetry.session_id()
+
+
+def store(state, key, data):
+    """Put data in the store and keep only its digest in state[key]; returns the digest."""
+    digest = put(data)
+    state[key] = digest
+    retain(digest)
+    return digest
+
+
+def load(state, key):
+    """Bytes of the blob whose digest is in state[key], or None."""
+    digest = state.get(key)
+    if digest:
+        retain(digest)
+    return get(digest)
+
+
+def retain(digest, session=None):
+    session = session or _session_id()
+    with _refs_lock:
+        _refs.setdefault(session, set()).add(digest)
+
+
+def _live_sessions():
+    try:
+        from streamlit import runtime
+    except ImportError:
+        return None
+    if not runtime.exists():
+        return None
+    instance = runtime.get_instance()
+    # Script threads add sessions concurrently; check a snapshot
+    with _refs_lock:
+        sessions = list(_refs)
+    return {session for session in sessions if session is None or instance.is_active_session(session)}
+
+
+def collect_garbage(grace=GC_GRACE):
+    """Drop references of ended sessions and delete unreferenced blobs older than grace seconds; returns the bytes freed."""
+    live = _live_sessions()
+    with _refs_lock:
+        if live is not None:
+            for session in [s for s in _refs if s not in live]:
+                del _refs[session]
+        referenced = set().union(*_refs.values()) if _refs else set()
+    cutoff = time.time() - grace
+    freed = 0
+    if not os.path.isdir(BLOB_DIR):
+        return freed
+    for prefix in os.listdir(BLOB_DIR):
+        folder = os.path.join(BLOB_DIR, prefix)
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            try:
+                stat = os.stat(path)
+                if name not in referenced and stat.st_mtime < cutoff:
+                    os.remove(path)
+                    freed += stat.st_size
+            except FileNotFoundError:
+                pass
+    return freed
+
+
+def _maybe_collect():
+    global _last_gc
+    now = time.time()
+    if now - _last_gc < GC_INTERVAL:
+        return
+    _last_gc = now
+    threading.Thread(target=collect_garbage, daemon=True).start()
+
+
+def stats():
+    count = size = 0
+    if os.path.isdir(BLOB_DIR):
+        for prefix in os.listdir(BLOB_DIR):
+            for entry in os.scandir(os.path.join(BLOB_DIR, prefix)):
+                count += 1
+                size += entry.stat().st_size
+    return {"blobs": count, "bytes": size, **DECODED.stats()}
+
+
+# --- Decoded images ---
+class DecodedCache:
+    """Bounded LRU of decoded, orientation-corrected RGB images by (digest, max_edge), shared by all sessions."""
+
+    def __init__(self, max_bytes=DECODED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest, max_edge=None):
+        key = (digest, max_edge)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        img = self._decode(digest, max_edge)
+        if img is None:
+            return None
+        size = img.width * img.height * 3
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = img
+                self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= old.width * old.height * 3
+        return img
+
+    def _decode(self, digest, max_edge):
+        from PIL import Image, ImageOps
+        if max_edge is not None:
+            base = self.get(digest)
+            if base is None:
+                return None
+            proxy = base.copy()
+            proxy.thumbnail((max_edge, max_edge), Image.BILINEAR)
+            return proxy
+        data = get(digest)
+        if data is None:
+            return None
+        return ImageOps.exif_transpose(Image.open(io.BytesIO(data))).convert("RGB")
+
+    def stats(self):
+        with self._lock:
+            return {"decoded": len(self._items), "decoded_bytes": self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+DECODED = DecodedCache()
+
+
+def image(digest, max_edge=None):
+    """Decoded RGB image of a blob (downscaled to max_edge when given), from the shared LRU."""
+    return DECODED.get(digest, max_edge)
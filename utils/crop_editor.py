@@ -0,0 +1,27 @@
+# Client-side pan/zoom crop editor.
+# The browser receives one preview-resolution image and positions it with CSS transforms while the user drags,
+# scrolls or moves the zoom control, using the same cover/offset geometry as utils.images.fit_image_with_offset.
+# Nothing reaches the server until "Apply crop", which returns {"zoom", "offset_x", "offset_y"} once.
+# The frontend is a static page (assets/crop_editor/index.html) speaking Streamlit's component protocol,
+# so no JavaScript build step is needed.
+
+import os
+
+import streamlit.components.v1 as components
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "crop_editor")
+
+_component = components.declare_component("crop_editor", path=FRONTEND_DIR)
+
+
+def crop_editor(src, frame_w, frame_h, params, key):
+    """Show the editor for the image at src (URL) in a frame_w×frame_h frame, starting from params.
+
+    Returns the last applied (zoom, offset_x, offset_y), or None while nothing has been applied.
+    """
+    zoom, offset_x, offset_y = params
+    value = _component(src=src, frame_w=frame_w, frame_h=frame_h, zoom=zoom, offset_x=offset_x, offset_y=offset_y,
+                       key=key, default=None)
+    if not value:
+        return None
+    return tuple(float(value[name]) for name in ("zoom", "offset_x", "offset_y"))
@@ -0,0 +1,97 @@
+# Cached read access to the store for all pages.
+# Each collection is loaded once and shared by every session until something changes. Writes in this process are
+# detected through the store's write counter, which costs nothing to check. Writes by other processes (such as
+# batch_generate.py) are detected through the mtimes of the database and its WAL file, checked at most every
+# EXTERNAL_CHECK_INTERVAL seconds, so an unchanged rerun does no file I/O and opens no connection.
+# The returned dicts are shared: treat them as read-only and save changes through utils.store.
+
+import os
+import threading
+import time
+
+from utils import archive, store, telemetry
+
+EXTERNAL_CHECK_INTERVAL = 2.0
+
+_cache = {}
+_lock = threading.Lock()
+_ready = False
+_files = (0.0, None)
+
+
+def _setup():
+    # The store's one-time setup (schema, JSON import) writes to the database; doing it before the first
+    # stamp keeps those writes from invalidating the first load
+    global _ready
+    if not _ready:
+        store.connect()
+        _ready = True
+
+
+def _file_stamp():
+    global _files
+    checked, stamp = _files
+    now = time.monotonic()
+    if stamp is None or now - checked >= EXTERNAL_CHECK_INTERVAL:
+        stamps = []
+        for path in (store.DB_PATH, store.DB_PATH + "-wal"):
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        stamp = tuple(stamps)
+        _files = (now, stamp)
+    return stamp
+
+
+def _stamp():
+    _setup()
+    return store.write_version(), _file_stamp()
+
+
+def _cached(name, loader, *args):
+    # One entry per name: loader(*args) is reused until the store changes or it is asked for with other args
+    stamp = (_stamp(), args)
+    with _lock:
+        entry = _cache.get(name)
+        if entry is not None and entry[0] == stamp:
+            telemetry.count("data_cache_hits")
+            return entry[1]
+    with telemetry.span("data.load", collection=name):
+        value = loader(*args)
+    with _lock:
+        _cache[name] = (stamp, value)
+    return value
+
+
+def get_projects():
+    return _cached("projects", store.load_projects)
+
+
+def get_style_profiles():
+    return _cached("style_profiles", store.load_style_profiles)
+
+
+def get_website_styles():
+    return _cached("website_styles", store.load_website_styles)
+
+
+def get_last_project():
+    # Fallback project for previews: the last one in the store, like the last key of the old JSON file
+    projects = get_projects()
+    return list(projects.values())[-1] if projects else {}
+
+
+def get_top_usps(project_type, query="", limit=12):
+    """store.top_usps(), cached for the last project type and filter asked."""
+    return _cached("top_usps", store.top_usps, project_type, query, limit)
+
+
+def search_archive(text="", project=None, style=None, kind=None, limit=50):
+    """archive.search(), cached per kind for the last query asked."""
+    return _cached(f"archive_search.{kind}", archive.search, text, project, style, kind, limit)
+
+
+def get_archive_facets(kind=None):
+    return _cached(f"archive_facets.{kind}", archive.facets, kind)
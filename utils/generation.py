@@ -0,0 +1,232 @@
+# Website article generation: request building, response parsing and the per-length / combined request modes,
+# plus the Instagram caption and hashtag requests written from an article. The prompts come from utils.prompts.
+# Shared by the Project Setup and Instagram pages, the content pipeline and the batch_generate.py command line tool.
+
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import telemetry
+from utils.llm_cache import CACHE, chat_completion
+from utils.prompts import article_prompt, caption_prompt, combined_article_prompt, hashtag_prompt, prompt_text
+
+
+LENGTH_MAP = {"short": 50, "medium": 120, "long": 250}
+MAX_PARALLEL_REQUESTS = 3
+CAPTION_LENGTHS = [80, 200, 400]
+MAX_HASHTAGS = 15
+GENERATION_MODES = {
+    "parallel": "One request per length (parallel)",
+    "sequential": "One request per length (sequential)",
+    "combined": "Single request for all lengths (JSON)",
+}
+ARTICLES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        label: {
+            "type": "object",
+            "properties": {"title": {"type": "string"}, "body": {"type": "string"}},
+            "required": ["title", "body"],
+            "additionalProperties": False,
+        }
+        for label in LENGTH_MAP
+    },
+    "required": list(LENGTH_MAP),
+    "additionalProperties": False,
+}
+
+
+def build_messages(parts, image_url=None):
+    # parts = [instructions and context, task]: the image goes before the task, so the shared prefix includes it
+    if image_url:
+        return [{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": parts[0]},
+                {"type": "image_url", "image_url": {"url": image_url}},
+                {"type": "text", "text": parts[1]}
+            ]
+        }]
+    return [{"role": "user", "content": prompt_text(parts)}]
+
+
+def parse_article(output):
+    lines = output.strip().splitlines()
+    headline = lines[0] if lines else "[No headline generated]"
+    body = "\n".join(lines[1:]).strip() if len(lines) > 1 else "[No article generated]"
+    return {"title": headline, "sections": [{"body": body}]}
+
+
+def parse_combined_articles(output):
+    try:
+        data = json.loads(output)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Model did not return valid JSON: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ValueError("Model response is not a JSON object.")
+    results = {}
+    for label in LENGTH_MAP:
+        article = data.get(label)
+        if not isinstance(article, dict) or not isinstance(article.get("title"), str) or not isinstance(article.get("body"), str):
+            raise ValueError(f"Model response is missing a valid '{label}' article.")
+        results[label] = {
+            "title": article["title"].strip() or "[No headline generated]",
+            "sections": [{"body": article["body"].strip() or "[No article generated]"}]
+        }
+    return results
+
+
+def generate_length(project, usps, style, label, word_count, image_url=None, force=False, on_token=None, metrics=None):
+    parts = article_prompt(project, usps, style, label, word_count, bool(image_url), "gpt-4o" if image_url else "gpt-3.5-turbo")
+    if image_url:
+        output = chat_completion(
+            on_token=on_token,
+            force=force,
+            metrics=metrics,
+            model="gpt-4o",
+            messages=build_messages(parts, image_url),
+            max_tokens=800,
+            temperature=0.7
+        )
+    else:
+        output = chat_completion(
+            on_token=on_token,
+            force=force,
+            metrics=metrics,
+            model="gpt-3.5-turbo",
+            messages=build_messages(parts),
+            max_tokens=500,
+            temperature=0.7
+        )
+    return parse_article(output)
+
+
+def generate_combined(project, usps, style, image_url=None, force=False, on_token=None, metrics=None):
+    parts = combined_article_prompt(project, usps, style, LENGTH_MAP, bool(image_url), "gpt-4o" if image_url else "gpt-3.5-turbo")
+    metrics = {} if metrics is None else metrics
+    if image_url:
+        output = chat_completion(
+            on_token=on_token,
+            force=force,
+            metrics=metrics,
+            model="gpt-4o",
+            messages=build_messages(parts, image_url),
+            max_tokens=1600,
+            temperature=0.7,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "website_articles", "schema": ARTICLES_SCHEMA, "strict": True}
+            }
+        )
+    else:
+        # gpt-3.5-turbo only supports JSON mode, the schema is enforced by parse_combined_articles
+        output = chat_completion(
+            on_token=on_token,
+            force=force,
+            metrics=metrics,
+            model="gpt-3.5-turbo",
+            messages=build_messages(parts),
+            max_tokens=1200,
+            temperature=0.7,
+            response_format={"type": "json_object"}
+        )
+    try:
+        return parse_combined_articles(output)
+    except ValueError:
+        # A stored answer that does not parse would fail the same way on every retry
+        CACHE.delete(metrics["cache_key"])
+        raise
+
+
+def generate_text(project, usps, style, img_bytes, mode="sequential", max_workers=MAX_PARALLEL_REQUESTS, timings=None, force=False, on_token=None, request_metrics=None):
+    with telemetry.span("generate_text", mode=mode, image=bool(img_bytes)):
+        return _generate_text(project, usps, style, img_bytes, mode, max_workers, timings, force, on_token, request_metrics)
+
+
+def _generate_text(project, usps, style, img_bytes, mode, max_workers, timings, force, on_token, request_metrics):
+    # timings (optional dict) receives the latency of each request plus the total wall-clock time in seconds
+    # force=True bypasses the response cache and stores the fresh responses instead
+    # on_token(label, text) streams the output; it is always called from the calling thread, also in parallel mode
+    # request_metrics (optional dict) receives token usage per request, plus time-to-first-token and tokens per second when streaming
+    # The image is oriented, downscaled and re-encoded once; every request reuses the same payload
+    image_url = None
+    if img_bytes:
+        from utils.images import prepare_image  # loads PIL, only needed with an image
+        image_url = prepare_image(img_bytes).data_url
+    token_queue = queue.Queue() if on_token and mode == "parallel" else None
+
+    def timed(label, word_count):
+        callback = None
+        if token_queue is not None:
+            callback = lambda text: token_queue.put((label, text))
+        elif on_token:
+            callback = lambda text: on_token(label, text)
+        metrics = {}
+        t0 = time.perf_counter()
+        result = generate_length(project, usps, style, label, word_count, image_url, force, callback, metrics)
+        if request_metrics is not None:
+            request_metrics[label] = metrics
+        return result, time.perf_counter() - t0
+
+    started = time.perf_counter()
+    results = {}
+    latencies = {}
+    if mode == "combined":
+        metrics = {}
+        callback = (lambda text: on_token("combined", text)) if on_token else None
+        results = generate_combined(project, usps, style, image_url, force, callback, metrics)
+        latencies["combined"] = time.perf_counter() - started
+        if request_metrics is not None:
+            request_metrics["combined"] = metrics
+    elif mode == "parallel":
+        workers = max(1, min(max_workers, len(LENGTH_MAP)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {label: telemetry.submit(pool, timed, label, wc) for label, wc in LENGTH_MAP.items()}
+            if token_queue is not None:
+                # Relay streamed tokens from the workers to the calling (Streamlit script) thread
+                while not all(f.done() for f in futures.values()) or not token_queue.empty():
+                    try:
+                        on_token(*token_queue.get(timeout=0.05))
+                    except queue.Empty:
+                        pass
+            for label, future in futures.items():
+                results[label], latencies[label] = future.result()
+    elif mode == "sequential":
+        for label, word_count in LENGTH_MAP.items():
+            results[label], latencies[label] = timed(label, word_count)
+    else:
+        raise ValueError(f"Unknown generation mode: {mode}")
+    if timings is not None:
+        timings.update(latencies)
+        timings["total"] = time.perf_counter() - started
+    return results
+
+
+# --- Instagram captions and hashtags ---
+def generate_caption(source_text, tone, length, force=False, on_token=None, metrics=None):
+    """One Instagram caption of about length characters, written from source_text (see prompts.caption_source)."""
+    if not source_text:
+        raise ValueError("No website content available. Please generate website content first.")
+    return chat_completion(
+        on_token=on_token,
+        force=force,
+        metrics=metrics,
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": caption_prompt(source_text, tone, length)}],
+        max_tokens=length+50,
+        temperature=0.7
+    ).strip()
+
+
+def generate_hashtags(source_text, force=False):
+    if not source_text:
+        raise ValueError("No website content available. Please generate website content first.")
+    output = chat_completion(
+        force=force,
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": hashtag_prompt(source_text)}],
+        max_tokens=150,
+        temperature=0.7
+    )
+    return [tag for tag in output.split() if tag.startswith("#")][:MAX_HASHTAGS]
@@ -0,0 +1,157 @@
+# Image preparation for the vision model: orientation fix, downscaling and compact re-encoding.
+
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+from utils import telemetry
+
+# gpt-4o (detail "high") fits images into 2048×2048 and then scales the shortest side to 768px,
+# so anything larger is only upload and token overhead.
+VISION_MAX_EDGE = 2048
+VISION_MAX_SHORT_EDGE = 768
+ENCODE_FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+RENDITION_CACHE_BYTES = 64 * 1024 * 1024
+PREPARED_CACHE_SIZE = 8
+
+_prepared = OrderedDict()
+_prepared_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime: str
+    sha256: str
+    width: int
+    height: int
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode()}"
+
+
+def prepare_image(img_bytes, fmt="JPEG", quality=85):
+    """Return the smallest payload of img_bytes the vision model still sees at full detail.
+
+    Memoized by the upload's SHA-256: the cache holds digests and the small prepared payloads, never the uploads.
+    """
+    key = (hashlib.sha256(img_bytes).hexdigest(), fmt, quality)
+    with _prepared_lock:
+        if key in _prepared:
+            _prepared.move_to_end(key)
+            return _prepared[key]
+    prepared = _prepare_image(img_bytes, fmt, quality)
+    with _prepared_lock:
+        _prepared[key] = prepared
+        while len(_prepared) > PREPARED_CACHE_SIZE:
+            _prepared.popitem(last=False)
+    return prepared
+
+
+def _prepare_image(img_bytes, fmt, quality):
+    img = Image.open(io.BytesIO(img_bytes))
+    w, h = img.size
+    scale = min(1.0, VISION_MAX_EDGE / max(w, h), VISION_MAX_SHORT_EDGE / min(w, h))
+    if scale < 1.0 and img.format == "JPEG":
+        # Let the JPEG decoder do most of the downscaling (DCT scaling) instead of decoding full size
+        img.draft("RGB", (round(w * scale), round(h * scale)))
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        # Flatten transparency onto white, matching how the renderings are framed elsewhere
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        img = img.convert("RGB")
+    w, h = img.size
+    scale = min(1.0, VISION_MAX_EDGE / max(w, h), VISION_MAX_SHORT_EDGE / min(w, h))
+    if scale < 1.0:
+        img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, fmt, quality=quality, optimize=True)
+    data = buf.getvalue()
+    return PreparedImage(data, ENCODE_FORMATS[fmt], hashlib.sha256(data).hexdigest(), *img.size)
+
+
+@telemetry.timed("fit_image_with_offset")
+def fit_image_with_offset(img: Image.Image, frame_w, frame_h, zoom=1.0, offset_x=0.0, offset_y=0.0, resample=Image.LANCZOS, oriented=False):
+    # oriented=True skips the EXIF transpose/convert for images coming from an already oriented RGB base
+    base = img if oriented else ImageOps.exif_transpose(img).convert("RGB")
+    iw, ih = base.size
+    target_ratio = frame_w / frame_h
+    img_ratio = iw / ih
+
+    # Calculate scale to cover the frame
+    if img_ratio > target_ratio:
+        scale = frame_h / ih
+    else:
+        scale = frame_w / iw
+    scale *= max(zoom, 0.1)
+
+    new_w = int(iw * scale)
+    new_h = int(ih * scale)
+    scaled = base.resize((new_w, new_h), resample)
+
+    # Center the image, then apply offset
+    max_dx = max(0, new_w - frame_w)
+    max_dy = max(0, new_h - frame_h)
+    # Offset is always relative to center
+    px = int((frame_w - new_w) / 2 - (max_dx / 2) * offset_x)
+    py = int((frame_h - new_h) / 2 - (max_dy / 2) * offset_y)
+
+    canvas = Image.new("RGB", (frame_w, frame_h), (255, 255, 255))
+    canvas.paste(scaled, (px, py))
+    return canvas
+
+
+def encode_image(img, fmt, quality=None):
+    with telemetry.span("encode_image", format=fmt, size=img.size) as attrs:
+        buf = io.BytesIO()
+        if fmt == "PNG":
+            # compress_level 1 is several times faster than the default and only slightly larger
+            img.save(buf, "PNG", compress_level=1)
+        else:
+            img.save(buf, fmt, quality=quality or 90)
+        attrs["bytes"] = buf.tell()
+    return buf.getvalue()
+
+
+class RenditionCache:
+    """Bounded in-memory LRU of encoded renditions, shared by all sessions of the process.
+
+    Keys describe the rendition (source hash, frame size, crop parameters, format, quality), so a
+    rendition is rendered and encoded at most once per setting and only when it is first requested.
+    """
+
+    def __init__(self, max_bytes=RENDITION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, key, render, fmt, quality=None):
+        # render is only called on a miss and returns the PIL image to encode
+        key = tuple(key) + (fmt, quality)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        data = encode_image(render(), fmt, quality)
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old)
+        return data
+
+
+RENDITIONS = RenditionCache()
@@ -0,0 +1,170 @@
+# Background jobs for long-running generation.
+# Jobs run on a process-wide worker pool, so they keep running when the submitting page reruns, the user
+# switches pages or the script run is interrupted. Submitting returns a job id; a session remembers its ids
+# in session state and collect() copies the results of finished jobs into that session's state on its next rerun.
+# Jobs are keyed by their inputs: submitting the same inputs while a job is queued or running attaches to it
+# instead of starting (and paying for) the same requests twice.
+# Progress is polled: the submitting page renders the job's streamed text in a fragment that reruns every half
+# second, and pages that show the result use watch(), which reruns the page once the job has finished.
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils import telemetry
+
+MAX_JOB_WORKERS = int(os.getenv("ARCHINEWS_JOB_WORKERS", "2"))
+# Finished jobs are kept this long (seconds) for sessions that have not collected them yet
+JOB_TTL = 3600
+PENDING_KEY = "pending_jobs"
+
+_pool = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS, thread_name_prefix="archinews-job")
+_jobs = {}
+_active = {}
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+class Job:
+    """One submitted job; fields are written by the worker and read by any number of sessions."""
+
+    def __init__(self, job_id, key, kind, label):
+        self.id = job_id
+        self.key = key
+        self.kind = kind
+        self.label = label
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.streamed = {}
+        self.state = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def on_token(self, label, text):
+        # Streaming callback for the worker; pages render job.streamed while the job runs
+        with self._lock:
+            self.streamed[label] = self.streamed.get(label, "") + text
+
+    def stream_snapshot(self):
+        with self._lock:
+            return dict(self.streamed)
+
+    def elapsed(self):
+        return (self.finished or time.time()) - (self.started or self.submitted)
+
+
+def input_key(kind, **inputs):
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{kind}\n{payload}".encode("utf-8")).hexdigest()
+
+
+def _run(job, fn, args, kwargs):
+    job.status = "running"
+    job.started = time.time()
+    try:
+        with telemetry.span("job", kind=job.kind):
+            job.state = fn(job, *args, **kwargs)
+        job.status = "done"
+    except Exception as exc:
+        job.error = str(exc)
+        job.status = "error"
+    finally:
+        job.finished = time.time()
+        with _lock:
+            if _active.get(job.key) is job:
+                del _active[job.key]
+
+
+def _prune():
+    cutoff = time.time() - JOB_TTL
+    for job_id in [i for i, job in _jobs.items() if job.finished and job.finished < cutoff]:
+        del _jobs[job_id]
+
+
+def submit(kind, key, fn, *args, label="", **kwargs):
+    """Run fn(job, *args, **kwargs) in the background; it returns a dict of session state updates.
+
+    Returns (job_id, attached): attached is True when a job with the same key was already queued or running.
+    """
+    with _lock:
+        _prune()
+        job = _active.get(key)
+        if job is not None:
+            return job.id, True
+        job = Job(next(_ids), key, kind, label)
+        _jobs[job.id] = job
+        _active[key] = job
+    telemetry.submit(_pool, _run, job, fn, args, kwargs)
+    return job.id, False
+
+
+def get(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def track(state, job_id):
+    """Remember a job id in a session's state so collect() picks up its result."""
+    pending = state.setdefault(PENDING_KEY, [])
+    if job_id not in pending:
+        pending.append(job_id)
+
+
+def pending(state, kind=None):
+    """The session's jobs that are still queued or running."""
+    jobs = [get(job_id) for job_id in state.get(PENDING_KEY, [])]
+    return [job for job in jobs if job is not None and job.active and (kind is None or job.kind == kind)]
+
+
+def collect(state):
+    """Apply finished jobs to the session state; returns the jobs applied. Call at the top of every page."""
+    applied = []
+    remaining = []
+    for job_id in state.get(PENDING_KEY, []):
+        job = get(job_id)
+        if job is None:
+            continue
+        if job.active:
+            remaining.append(job_id)
+            continue
+        if job.status == "done":
+            state.update(job.state or {})
+            state.pop(f"{job.kind}_job_error", None)
+        else:
+            state[f"{job.kind}_job_error"] = job.error
+        applied.append(job)
+    if PENDING_KEY in state:
+        state[PENDING_KEY] = remaining
+    return applied
+
+
+@st.fragment(run_every=1)
+def _notice(kind, message):
+    running = pending(st.session_state, kind)
+    if not running:
+        st.rerun()
+    st.info(f"{message} ({running[0].elapsed():.0f}s)")
+
+
+def watch(kind, message):
+    """On pages that show a job's result: a notice that polls while the session's job runs, then reruns the page."""
+    if pending(st.session_state, kind):
+        _notice(kind, message)
+
+
+def stats():
+    with _lock:
+        jobs = list(_jobs.values())
+    return {status: sum(1 for job in jobs if job.status == status) for status in ("queued", "running", "done", "error")}
@@ -0,0 +1,268 @@
+# Disk-backed, content-addressed cache for OpenAI chat completions.
+# Entries are keyed by a hash of the full request (model, temperature, rendered prompt, image data)
+# and evicted least-recently-used once the cache grows past MAX_BYTES or an entry is older than MAX_AGE.
+# Only complete answers are stored: a response cut off at the token limit (or otherwise not finished with "stop")
+# or with empty content is returned but not cached, so asking again makes a new request.
+# Entry and byte counts are kept as running totals (refreshed by every eviction pass), so showing the cache
+# stats does not scan the cache directory.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from utils import telemetry
+from utils.llm_client import create_chat_completion, settle_stream_usage
+
+CACHE_DIR = "data/cache/llm"
+MAX_BYTES = 50 * 1024 * 1024
+MAX_AGE = 30 * 24 * 3600
+
+
+class ResponseCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(request):
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is not None and time.time() - entry.get("created", 0) > self.max_age:
+            self._remove(path)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Touch the file so its mtime reflects the last access for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("content")
+
+    def put(self, key, content, **meta):
+        entry = {"created": time.time(), "content": content, **meta}
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def delete(self, key):
+        """Drop one entry, e.g. a response its caller could not use."""
+        self._remove(self._path(key))
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+        return entries
+
+    def evict(self):
+        now = time.time()
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for mtime, size, path in entries:
+            # mtime is the last access; anything untouched for max_age is stale regardless of size
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                continue
+            if self._remove(path, count=False):
+                total -= size
+                count -= 1
+        with self._lock:
+            self._entries, self._bytes = count, total
+
+    def _remove(self, path, count=True):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        if count:
+            with self._lock:
+                if self._entries is not None:
+                    self._entries -= 1
+                    self._bytes -= size
+        return True
+
+    def clear(self):
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith(".json"):
+                    self._remove(item.path, count=False)
+        with self._lock:
+            self._entries, self._bytes = 0, 0
+
+    def stats(self):
+        with self._lock:
+            counted = self._entries is not None
+        if not counted:
+            # Counted once per process; put() keeps the totals current afterwards
+            entries = self._scan()
+            with self._lock:
+                if self._entries is None:
+                    self._entries, self._bytes = len(entries), sum(size for _, size, _ in entries)
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self._entries,
+                "bytes": self._bytes,
+            }
+
+
+CACHE = ResponseCache()
+
+
+def _usage_metrics(usage):
+    if usage is None:
+        return {"prompt_tokens": None, "completion_tokens": None, "total_tokens": None}
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+def _cacheable(content, finish_reason):
+    return finish_reason == "stop" and isinstance(content, str) and bool(content)
+
+
+def cached_chat_completion(force=False, metrics=None, **request):
+    """Return the message content for a chat completion request, served from the cache when possible.
+
+    force=True skips the lookup and overwrites the cached entry with a fresh response.
+    metrics (optional dict) receives whether the cache answered, the model, the billed token usage (0 on a hit)
+    and the cache key, so a caller can CACHE.delete() a response it cannot parse.
+    """
+    key = CACHE.make_key(request)
+    if metrics is not None:
+        metrics["cache_key"] = key
+    if not force:
+        content = CACHE.get(key)
+        if content is not None:
+            if metrics is not None:
+                metrics.update(cached=True, model=request.get("model"), prompt_tokens=0, completion_tokens=0, total_tokens=0)
+            return content
+    response = create_chat_completion(**request)
+    content = response.choices[0].message.content
+    if _cacheable(content, getattr(response.choices[0], "finish_reason", None)):
+        CACHE.put(key, content, model=request.get("model"))
+    if metrics is not None:
+        metrics.update(cached=False, model=request.get("model"), **_usage_metrics(getattr(response, "usage", None)))
+    return content
+
+
+def cached_chat_stream(on_token, force=False, metrics=None, **request):
+    """Streaming variant of cached_chat_completion; on_token(text) is called for every content delta.
+
+    metrics (optional dict) receives time-to-first-token, total time, completion tokens and tokens per second.
+    A cache hit is delivered as a single delta.
+    """
+    key = CACHE.make_key(request)
+    if metrics is not None:
+        metrics["cache_key"] = key
+    if not force:
+        content = CACHE.get(key)
+        if content is not None:
+            on_token(content)
+            if metrics is not None:
+                metrics.update(cached=True, model=request.get("model"), ttft=0.0, duration=0.0, prompt_tokens=0, completion_tokens=0,
+                               total_tokens=0, tokens_per_second=None)
+            return content
+    started = time.perf_counter()
+    first_token_at = None
+    usage = None
+    chunks = 0
+    parts = []
+    finish_reason = None
+    stream = create_chat_completion(stream=True, stream_options={"include_usage": True}, **request)
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            chunks += 1
+            parts.append(delta)
+            on_token(delta)
+    finished = time.perf_counter()
+    settle_stream_usage(request, usage)
+    content = "".join(parts)
+    if _cacheable(content, finish_reason):
+        CACHE.put(key, content, model=request.get("model"))
+    if metrics is not None:
+        usage_metrics = _usage_metrics(usage)
+        # Without a usage chunk, each content delta is roughly one token
+        tokens = usage_metrics["completion_tokens"] if usage is not None else chunks
+        generation_time = finished - (first_token_at or finished)
+        metrics.update(usage_metrics)
+        metrics.update(
+            cached=False,
+            model=request.get("model"),
+            ttft=(first_token_at or finished) - started,
+            duration=finished - started,
+            completion_tokens=tokens,
+            tokens_per_second=tokens / generation_time if generation_time > 0 else None,
+        )
+    return content
+
+
+def chat_completion(on_token=None, force=False, metrics=None, **request):
+    # Dispatch to the streaming path when a token callback is given; every call is recorded as a telemetry span
+    metrics = {} if metrics is None else metrics
+    with telemetry.span("llm.chat_completion", model=request.get("model"), stream=on_token is not None) as attrs:
+        if on_token is None:
+            content = cached_chat_completion(force=force, metrics=metrics, **request)
+        else:
+            content = cached_chat_stream(on_token, force=force, metrics=metrics, **request)
+        attrs.update(cached=metrics.get("cached"), tokens=metrics.get("total_tokens"))
+    telemetry.count("tokens", metrics.get("total_tokens") or 0)
+    return content
+
+
+def format_stream_metrics(metrics):
+    if metrics.get("cached"):
+        return "cached"
+    tps = metrics.get("tokens_per_second")
+    return f"TTFT {metrics['ttft']:.2f}s · {tps:.0f} tok/s" if tps else f"TTFT {metrics['ttft']:.2f}s"
+
+
+def cache_stats_caption():
+    stats = CACHE.stats()
+    return f"Response cache – {stats['hits']} hits · {stats['misses']} misses · {stats['entries']} entries ({stats['bytes'] / 1024:.0f} KB)"
@@ -0,0 +1,163 @@
+# Shared OpenAI client for all pages and the batch tool.
+# One pooled client per process, per-call timeouts, retries with jittered exponential backoff for
+# 429/5xx/connection errors, and a process-wide token-bucket scheduler for requests and tokens per minute,
+# so concurrent sessions queue instead of running into rate-limit errors.
+# The openai package takes about half a second to import, so it is only loaded once a request is sent.
+
+import functools
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+VISION_TIMEOUT = float(os.getenv("OPENAI_VISION_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM_LIMIT", "30000"))
+# Rough cost of one high-detail image for the budget estimate (768×768 → 4 tiles × 170 + 85)
+IMAGE_TOKEN_ESTIMATE = 765
+
+_client = None
+_client_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors():
+    import openai
+    return (openai.RateLimitError, openai.InternalServerError, openai.APITimeoutError, openai.APIConnectionError)
+
+
+def api_key():
+    return os.getenv("OPENAI_API_KEY")
+
+
+def get_client():
+    """Return the process-wide OpenAI client; its HTTP connection pool is reused by every call."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            # Retries are handled here (with the rate limiter in the loop), not by the SDK
+            _client = openai.OpenAI(api_key=api_key(), timeout=DEFAULT_TIMEOUT, max_retries=0,
+                                    http_client=openai.DefaultHttpxClient())
+        return _client
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        # Take amount now (the level may go negative) and return how long the caller has to wait for it
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def adjust(self, delta):
+        # Correct an earlier estimate once the real usage is known
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - delta)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared by every session in the process."""
+
+    def __init__(self, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, estimated_tokens):
+        # Reservations are taken in arrival order, so waiting callers are served first come, first served
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            time.sleep(wait)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+LIMITER = RateLimiter()
+
+
+def estimate_tokens(request):
+    total = request.get("max_tokens") or 0
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                total += IMAGE_TOKEN_ESTIMATE
+            else:
+                total += len(part.get("text", "")) // 4 + 1
+    return total
+
+
+def _retry_delay(attempt, exc):
+    # Honour Retry-After when the API sends it, otherwise full-jitter exponential backoff
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _has_image(request):
+    return any(isinstance(m.get("content"), list) and any(p.get("type") == "image_url" for p in m["content"])
+               for m in request.get("messages", []))
+
+
+def create_chat_completion(timeout=None, **request):
+    """chat.completions.create with rate limiting, a per-call timeout and retries on 429/5xx/connection errors.
+
+    For stream=True only opening the stream is retried; the returned iterator is consumed by the caller.
+    """
+    if timeout is None:
+        timeout = VISION_TIMEOUT if _has_image(request) else DEFAULT_TIMEOUT
+    estimate = estimate_tokens(request)
+    retryable = retryable_errors()
+    attempt = 0
+    while True:
+        LIMITER.acquire(estimate)
+        try:
+            response = get_client().chat.completions.create(timeout=timeout, **request)
+        except retryable as exc:
+            # Nothing was generated, give the reservation back before waiting
+            LIMITER.settle(estimate, 0)
+            if attempt >= MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt, exc))
+            attempt += 1
+            continue
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LIMITER.settle(estimate, usage.total_tokens)
+        return response
+
+
+def settle_stream_usage(request, usage):
+    # Streams report usage in their last chunk, after create_chat_completion has returned
+    if usage is not None:
+        LIMITER.settle(estimate_tokens(request), usage.total_tokens)
@@ -0,0 +1,58 @@
+# Image delivery through Streamlit's media file manager.
+# Images are registered by content and referenced by URL, so the browser fetches (and caches) each image once
+# instead of receiving it as a base64 data URI inside the markup on every rerun.
+
+import base64
+
+import streamlit as st
+import streamlit.components.v1 as components
+from streamlit import runtime
+
+from utils import telemetry
+
+PAYLOAD_KEY = "_rerun_payload_bytes"
+
+
+def sniff_mime(data):
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def image_url(data, mime=None):
+    """Return a URL for the image bytes, usable as <img src> on any page."""
+    mime = mime or sniff_mime(data)
+    if not runtime.exists():
+        return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+    # Files are content-addressed by the manager, so the URL is stable across reruns and pages.
+    # hash() of a bytes object is cached on the object, which keeps re-registration cheap.
+    coordinates = f"media-{mime}-{len(data)}-{hash(data) & 0xFFFFFFFF:x}"
+    url = runtime.get_instance().media_file_mgr.add(data, mime, coordinates)
+    # The manager returns a root-relative "/media/..." URL; st.image adds server.baseUrlPath in the browser,
+    # raw <img> markup does not, so the prefix is added here
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    return f"/{base_path}{url}" if base_path else url
+
+
+def begin_payload_tracking():
+    # Call once at the top of a page; resets the per-rerun byte counter
+    st.session_state[PAYLOAD_KEY] = 0
+
+
+def render_html(html, component_height=None):
+    """Emit image markup via st.markdown (or an iframe component when component_height is given) and count its size."""
+    size = len(html.encode("utf-8"))
+    st.session_state[PAYLOAD_KEY] = st.session_state.get(PAYLOAD_KEY, 0) + size
+    telemetry.count("bytes_rendered", size)
+    if component_height is None:
+        st.markdown(html, unsafe_allow_html=True)
+    else:
+        components.html(html, height=component_height)
+
+
+def payload_caption():
+    return f"Image markup sent this rerun: {st.session_state.get(PAYLOAD_KEY, 0) / 1024:.1f} KB"
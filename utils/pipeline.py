@@ -0,0 +1,130 @@
+# Dependency-aware execution of multi-step generation.
+# A pipeline is a dict of named steps, each naming the steps whose results it takes. A step is started as soon as
+# all of its dependencies have finished, so independent branches run concurrently: once the article exists, the
+# three caption lengths and the hashtags are requested at the same time, and the whole content set takes about
+# as long as its longest branch instead of the sum of all requests.
+# A failed step skips the steps that depend on it; the other branches still finish.
+
+import functools
+import hashlib
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import archive, telemetry
+from utils.generation import CAPTION_LENGTHS, generate_caption, generate_hashtags, generate_text
+from utils.prompts import caption_source
+
+MAX_PIPELINE_WORKERS = 4
+
+
+class Step:
+    def __init__(self, fn, *deps):
+        self.fn = fn
+        self.deps = deps
+
+
+def _run_step(name, step, inputs):
+    with telemetry.span("pipeline.step", step=name):
+        t0 = time.perf_counter()
+        result = step.fn(*inputs)
+        return result, time.perf_counter() - t0
+
+
+def run(steps, max_workers=MAX_PIPELINE_WORKERS, timings=None):
+    """Run the steps in dependency order, independent ones in parallel; returns (results, errors) by step name.
+
+    timings (optional dict) receives each finished step's duration plus the total wall-clock time in seconds.
+    """
+    for name, step in steps.items():
+        unknown = [dep for dep in step.deps if dep not in steps]
+        if unknown:
+            raise ValueError(f"Step '{name}' depends on unknown step(s): {', '.join(unknown)}")
+    results, errors = {}, {}
+    waiting = dict(steps)
+    running = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while waiting or running:
+            for name, step in list(waiting.items()):
+                failed = [dep for dep in step.deps if dep in errors]
+                if failed:
+                    errors[name] = f"Skipped, '{failed[0]}' failed"
+                    del waiting[name]
+                elif all(dep in results for dep in step.deps):
+                    future = telemetry.submit(pool, _run_step, name, step, [results[dep] for dep in step.deps])
+                    running[future] = name
+                    del waiting[name]
+            if not running:
+                if waiting:
+                    raise ValueError(f"Dependency cycle between steps: {', '.join(waiting)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], seconds = future.result()
+                    if timings is not None:
+                        timings[name] = seconds
+                except Exception as exc:
+                    errors[name] = str(exc)
+    if timings is not None:
+        timings["total"] = time.perf_counter() - started
+    return results, errors
+
+
+# --- Full content set: website articles → Instagram captions and hashtags ---
+def content_set_steps(project, usps, style, img_bytes, mode, tone, force=False, web=None, on_token=None, metrics=None):
+    """Steps for articles (skipped when web is given), the caption source text, one caption per length and the hashtags.
+
+    metrics (optional dict) receives the request metrics per article and per caption length, and the article timings.
+    """
+    metrics = {} if metrics is None else metrics
+    if web is None:
+        article = functools.partial(generate_text, project, usps, style, img_bytes, mode=mode, timings=metrics.setdefault("timings", {}),
+                                    force=force, on_token=on_token, request_metrics=metrics.setdefault("articles", {}))
+    else:
+        article = lambda: web
+    steps = {"article": Step(article), "source": Step(caption_source, "article")}
+    for length in CAPTION_LENGTHS:
+        callback = (lambda text, label=f"caption {length}": on_token(label, text)) if on_token else None
+        steps[f"caption_{length}"] = Step(functools.partial(generate_caption, tone=tone, length=length, force=force,
+                                                            on_token=callback, metrics=metrics.setdefault(length, {})), "source")
+    steps["hashtags"] = Step(functools.partial(generate_hashtags, force=force), "source")
+    return steps
+
+
+def content_set_job(job, project, usps, style_name, style, img_bytes, img_hash, mode, tone, endings, force, stream, web=None):
+    """Job function (see utils.jobs) producing the full content set; returns the session state updates."""
+    timings = {}
+    metrics = {}
+    steps = content_set_steps(project, usps, style, img_bytes, mode, tone, force, web, job.on_token if stream else None, metrics)
+    results, errors = run(steps, timings=timings)
+    if "article" in errors:
+        raise RuntimeError(errors["article"])
+    web_results = results["article"]
+    state = {"pipeline_timings": timings}
+    if web is None:
+        archive.record_web(project, usps, style_name, style, mode, web_results, metrics["articles"], img_hash)
+        state.update(web=web_results, generation_timings=metrics["timings"], stream_metrics=metrics["articles"] if stream else {})
+    source_text = results.get("source", "")
+    captions = {}
+    for length in CAPTION_LENGTHS:
+        name = f"caption_{length}"
+        if name in results:
+            captions[length] = results[name] + ("\n" + "\n".join(endings) if endings else "")
+            archive.record_caption(project.get("name", ""), captions[length], length, tone, source_text, metrics[length])
+        else:
+            captions[length] = f"[Error generating caption: {errors[name]}]"
+    # The Instagram page shows the medium caption; the other lengths are response-cache hits on its length buttons
+    state.update(generated_caption=captions[200], caption_length=200)
+    if source_text:
+        state.update(auto_hashtags=results.get("hashtags", []), auto_hashtags_error=errors.get("hashtags"),
+                     auto_hashtags_hash=hashlib.sha256(source_text.encode("utf-8")).hexdigest())
+    return state
+
+
+def format_timings(timings):
+    # "article 2.1s · caption_80 0.9s · ... · wall-clock 3.4s (sum of steps 5.6s)"
+    steps = {name: seconds for name, seconds in timings.items() if name not in ("total", "source")}
+    parts = [f"{name} {seconds:.1f}s" for name, seconds in steps.items()]
+    return " · ".join(parts) + f" · wall-clock {timings['total']:.1f}s (sum of steps {sum(steps.values()):.1f}s)"
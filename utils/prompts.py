@@ -0,0 +1,175 @@
+# Prompt building for every OpenAI request of the app.
+# Prompts are laid out as static instructions → project (or source text) context → per-call variable part.
+# Article prompts are built as parts: the instructions and project context, then the variable task line. Requests
+# with an image send the image between the two (see utils.generation.build_messages), so all three per-length
+# requests for a project share instructions, context and image as one identical prefix. Only those image requests
+# get past the 1024-token minimum of OpenAI's automatic prompt caching; the text-only prompts stay well below it.
+# Empty project fields are left out.
+# Tokens are counted locally before a request is sent (with tiktoken when it is installed, otherwise with
+# a character estimate) and every call type has a token budget. Article prompts over budget drop USPs from
+# the end of the list until they fit.
+
+import functools
+import re
+
+ARTICLE_INSTRUCTIONS = """You are an expert architecture journalist writing website news. Use only the facts below, in the given style."""
+
+CAPTION_INSTRUCTIONS = """You are an expert social media copywriter. Write an Instagram caption for the architecture project described below. Do NOT repeat the website headline. Make it engaging and suitable for Instagram. Only output the caption text, no hashtags, no headline."""
+
+HASHTAG_INSTRUCTIONS = """Generate 15 relevant hashtags for an Instagram post about the architecture project described below. Only output hashtags separated by spaces."""
+
+PROJECT_FIELDS = [
+    ("Project Name", "name"),
+    ("Client", "client"),
+    ("Location", "location"),
+    ("Type", "type"),
+    ("Size/Scope", "size_scope"),
+    ("Timeline", "timeline"),
+    ("Phase", "phase"),
+]
+
+# Upper limits for the prompt (not the answer) per call type
+TOKEN_BUDGETS = {"article": 700, "combined": 800, "caption": 450, "hashtags": 400}
+# The caption and hashtag requests only need the gist of the article
+SOURCE_TOKEN_BUDGET = 220
+
+
+class PromptBudgetError(ValueError):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    encoding = _encoding(model)
+    if encoding is None:
+        # About four characters per token for English prose
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text, budget, model="gpt-3.5-turbo"):
+    """Cut text to at most budget tokens, at the last sentence (or word) boundary that fits."""
+    text = text.strip()
+    if count_tokens(text, model) <= budget:
+        return text
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    kept = []
+    for sentence in sentences:
+        if count_tokens(" ".join(kept + [sentence]), model) > budget:
+            break
+        kept.append(sentence)
+    if kept:
+        return " ".join(kept)
+    # A single sentence longer than the budget: longest word prefix that fits
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]), model) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+def prompt_text(parts):
+    """The prompt parts as one text, as sent to text-only models."""
+    return "\n\n".join(parts)
+
+
+def enforce_budget(prompt, kind, model="gpt-3.5-turbo"):
+    """Return the prompt's token count, or raise PromptBudgetError when it exceeds the budget for kind."""
+    tokens = count_tokens(prompt, model)
+    if tokens > TOKEN_BUDGETS[kind]:
+        raise PromptBudgetError(f"The {kind} prompt has {tokens} tokens, the budget is {TOKEN_BUDGETS[kind]}. "
+                                "Shorten the project details.")
+    return tokens
+
+
+# --- Website articles ---
+def project_context(project, usps, style, with_image=False):
+    lines = []
+    for label, key in PROJECT_FIELDS:
+        value = str(project.get(key) or "").strip()
+        if value:
+            lines.append(f"{label}: {value}")
+    firms = [f for f in project.get("architectural_firm", []) if f.strip()]
+    if firms:
+        lines.append(f"Architectural Firm: {', '.join(firms)}")
+    usps = [u for u in usps if u.strip()]
+    if usps:
+        lines.append(f"USPs: {', '.join(usps)}")
+    lines.append(f"Style: {style.get('voice') or 'neutral'} voice, {style.get('formality') or 'semi-formal'}, "
+                 f"structure {style.get('structure') or 'overview→details'}")
+    if with_image:
+        lines.append("Use the attached image as extra context.")
+    return "\n".join(lines)
+
+
+def _fit_usps(build, usps, kind, model):
+    # The most USPs (in their order) that keep the prompt within budget; raises only when even none fit
+    usps = [u for u in usps if u.strip()]
+    for count in range(len(usps), -1, -1):
+        parts = build(usps[:count])
+        if count_tokens(prompt_text(parts), model) <= TOKEN_BUDGETS[kind]:
+            return parts
+    enforce_budget(prompt_text(parts), kind, model)
+
+
+def article_prompt(project, usps, style, label, word_count, with_image, model="gpt-3.5-turbo"):
+    """[instructions and project context, task] for one article length."""
+    task = f"Task: a headline on the first line, then a {label} article of about {word_count} words."
+    build = lambda kept: [f"{ARTICLE_INSTRUCTIONS}\n\n{project_context(project, kept, style, with_image)}", task]
+    return _fit_usps(build, usps, "article", model)
+
+
+def combined_article_prompt(project, usps, style, word_counts, with_image, model="gpt-3.5-turbo"):
+    """[instructions and project context, task] for all lengths in one JSON response."""
+    lengths = ", ".join(f'"{label}" (about {word_count} words)' for label, word_count in word_counts.items())
+    task = (f"Task: one headline and article per length: {lengths}. Respond with a JSON object with those keys, "
+            'each value {"title": headline, "body": article} as plain text.')
+    build = lambda kept: [f"{ARTICLE_INSTRUCTIONS}\n\n{project_context(project, kept, style, with_image)}", task]
+    return _fit_usps(build, usps, "combined", model)
+
+
+# --- Instagram captions and hashtags ---
+def caption_source(web, model="gpt-3.5-turbo"):
+    """The article text captions and hashtags are written from: the long article, capped to SOURCE_TOKEN_BUDGET."""
+    article = (web or {}).get("long") or {}
+    text = article.get("title", "")
+    sections = article.get("sections", [])
+    if sections and isinstance(sections[0], dict):
+        text += " " + sections[0].get("body", "")
+    return truncate_to_tokens(text, SOURCE_TOKEN_BUDGET, model)
+
+
+def caption_prompt(source_text, tone, length, model="gpt-3.5-turbo"):
+    prompt = f"""{CAPTION_INSTRUCTIONS}
+
+Project text:
+{source_text}
+
+Style/Tone: {tone}
+Length: {length} characters"""
+    enforce_budget(prompt, "caption", model)
+    return prompt
+
+
+def hashtag_prompt(source_text, model="gpt-3.5-turbo"):
+    prompt = f"""{HASHTAG_INSTRUCTIONS}
+
+Project text:
+{source_text}"""
+    enforce_budget(prompt, "hashtags", model)
+    return prompt
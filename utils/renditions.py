@@ -0,0 +1,141 @@
+# Batch export of the full web/social rendition matrix in a process pool, packed into one ZIP.
+# The pool is created once per server process (and replaced if a worker dies). The source is decoded once, in
+# the server, and each rendition is sent the smallest reduction of it that still covers its frame; renditions
+# that need full resolution are sent the blob digest and decode it in the worker, once per worker.
+
+import io
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.images import RENDITIONS, encode_image, fit_image_with_offset
+
+# name -> (width, height, crop); crop selects which slider settings apply ("web" or "instagram")
+RENDITION_SIZES = {
+    "web_hero_1600x900": (1600, 900, "web"),
+    "web_hero_3200x1800@2x": (3200, 1800, "web"),
+    "web_thumb_400x225": (400, 225, "web"),
+    "web_thumb_800x450@2x": (800, 450, "web"),
+    "instagram_square_1080x1080": (1080, 1080, "instagram"),
+    "instagram_portrait_1080x1350": (1080, 1350, "instagram"),
+    "instagram_story_1080x1920": (1080, 1920, "instagram"),
+    "instagram_thumb_320x320": (320, 320, "instagram"),
+}
+EXPORT_FORMATS = {"JPEG": ("jpg", 92), "WEBP": ("webp", 90), "PNG": ("png", None)}
+# Session key the Website / Instagram pages read their image from -> the Image Scaler frame it is cropped to
+PREVIEW_FRAMES = {"website_blob": (1600, 900), "instagram_blob": (1080, 1080)}
+
+MAX_RENDITION_WORKERS = int(os.getenv("ARCHINEWS_RENDITION_WORKERS", str(os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # One pool per server process, started on the first export; spawn keeps it independent of the server's threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_RENDITION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died (e.g. out of memory); the pool cannot run anything else, the next export starts a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_crop(img_hash, frame_w, frame_h, crop=(1.0, 0.0, 0.0)):
+    """Full-quality PNG of the image blob img_hash cropped to one frame, kept in RENDITIONS under one key for every caller."""
+    from utils import blobs
+    key = ("full", img_hash, frame_w, frame_h) + tuple(crop)
+    return RENDITIONS.get_or_encode(key, lambda: fit_image_with_offset(blobs.image(img_hash), frame_w, frame_h, *crop, oriented=True), "PNG")
+
+
+def store_default_crops(state, img_hash):
+    """Store the default crop of every preview frame, so the other pages show the upload before the Image Scaler is opened."""
+    from utils import blobs
+    for key, (frame_w, frame_h) in PREVIEW_FRAMES.items():
+        blobs.store(state, key, render_crop(img_hash, frame_w, frame_h))
+
+
+def _source_for(img_hash, base, frame_w, frame_h, zoom, cache):
+    # The smallest integer reduction of the source that still covers the scaled frame, so workers receive
+    # (and resize) only the pixels a rendition needs; reductions are shared between renditions.
+    # Renditions that need the full resolution get the blob digest and decode it in the worker instead of
+    # receiving the full image once per rendition.
+    iw, ih = base.size
+    scale = max(frame_w / iw, frame_h / ih) * max(zoom, 0.1)
+    factor = max(1, int(1 / scale)) if scale < 1 else 1
+    if factor == 1:
+        return img_hash
+    if factor not in cache:
+        cache[factor] = base.reduce(factor)
+    return cache[factor]
+
+
+def _render_rendition(source, name, frame_w, frame_h, crop, formats):
+    started = time.perf_counter()
+    if isinstance(source, str):
+        from utils import blobs
+        source = blobs.image(source)
+    img = fit_image_with_offset(source, frame_w, frame_h, *crop, oriented=True)
+    files = []
+    for fmt in formats:
+        ext, quality = EXPORT_FORMATS[fmt]
+        files.append((f"{name}.{ext}", encode_image(img, fmt, quality)))
+    return name, files, time.perf_counter() - started
+
+
+def _export(img_hash, base, crops, formats, sizes):
+    report = {"renditions": {}}
+    reductions = {}
+    buf = io.BytesIO()
+    pool = _get_pool()
+    try:
+        # Images are already compressed, so the archive only stores them
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            futures = []
+            for name, (w, h, crop) in sizes.items():
+                params = tuple(crops[crop])
+                source = _source_for(img_hash, base, w, h, params[0], reductions)
+                futures.append(pool.submit(_render_rendition, source, name, w, h, params, tuple(formats)))
+            for future in as_completed(futures):
+                name, files, seconds = future.result()
+                for file_name, data in files:
+                    zf.writestr(file_name, data)
+                report["renditions"][name] = seconds
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    return buf.getvalue(), report
+
+
+def export_renditions(img_hash, crops, formats=tuple(EXPORT_FORMATS), sizes=None):
+    """Render every size in every format from the image blob img_hash and return (zip_bytes, report).
+
+    crops maps "web"/"instagram" to (zoom, offset_x, offset_y). Files are written into the ZIP as the
+    workers finish them; report holds per-rendition render time and the total wall-clock time.
+    A pool broken by a dying worker is replaced and the export retried once.
+    """
+    from utils import blobs
+    sizes = sizes or RENDITION_SIZES
+    base = blobs.image(img_hash)
+    if base is None:
+        raise FileNotFoundError(f"Image blob {img_hash} is not available")
+    started = time.perf_counter()
+    try:
+        zip_data, report = _export(img_hash, base, crops, formats, sizes)
+    except BrokenProcessPool:
+        zip_data, report = _export(img_hash, base, crops, formats, sizes)
+    report["total"] = time.perf_counter() - started
+    report["workers"] = max(1, min(MAX_RENDITION_WORKERS, len(sizes)))
+    return zip_data, report
@@ -0,0 +1,308 @@
+# SQLite storage for projects, style profiles, website text styles and custom USPs.
+# WAL mode lets readers and a writer work concurrently; every save is a single-record transaction,
+# so two users saving different projects at the same time never overwrite each other.
+# On first use the existing data/*.json files are imported once.
+# Custom USPs are also kept in usp_index: one row per normalized USP and project type with the number of
+# projects using it, updated on every save so lookups never have to scan all projects.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = "data/archinews.db"
+JSON_SOURCES = {
+    "projects": "data/projects.json",
+    "style_profiles": "data/styles.json",
+    "website_styles": "data/website_styles.json",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    type TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_type ON projects(type);
+CREATE TABLE IF NOT EXISTS project_usps (
+    project TEXT NOT NULL REFERENCES projects(name) ON DELETE CASCADE,
+    usp TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (project, usp)
+);
+CREATE INDEX IF NOT EXISTS idx_project_usps_usp ON project_usps(usp);
+CREATE TABLE IF NOT EXISTS style_profiles (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS website_styles (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usp_index (
+    norm TEXT NOT NULL,
+    project_type TEXT NOT NULL,
+    label TEXT NOT NULL,
+    projects INTEGER NOT NULL,
+    PRIMARY KEY (norm, project_type)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+_write_version = 0
+_version_lock = threading.Lock()
+# Script threads end after every rerun and their connections close with them. Closing the last connection
+# checkpoints and deletes the WAL file, which the data layer would see as a change; this one stays open.
+_keepalive = {}
+
+
+def connect(path=DB_PATH):
+    """Return this thread's connection to the store, creating the schema and importing JSON on first use."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        with _init_lock:
+            if path not in _initialized:
+                conn.executescript(SCHEMA)
+                import_json(conn)
+                build_usp_index(conn)
+                _initialized.add(path)
+                keeper = _keepalive[path] = sqlite3.connect(path, check_same_thread=False)
+                keeper.execute("SELECT 1 FROM meta LIMIT 1").fetchall()
+        conns[path] = conn
+    return conn
+
+
+class transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block; takes the write lock up front."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        global _write_version
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        if not exc_type:
+            with _version_lock:
+                _write_version += 1
+        return False
+
+
+def write_version():
+    """Counter of committed writes in this process; lets readers cache results until it changes."""
+    return _write_version
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def import_json(conn, sources=JSON_SOURCES):
+    # One-time import; the marker row keeps later starts from re-importing (or resurrecting deleted records)
+    with transaction(conn):
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return
+        for name, project in _read_json(sources["projects"]).items():
+            _upsert_project(conn, {**project, "name": project.get("name") or name})
+            _replace_usps(conn, project.get("name") or name, project.get("custom_usps", []))
+        for table in ("style_profiles", "website_styles"):
+            for name, style in _read_json(sources[table]).items():
+                _upsert_named(conn, table, name, style)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (str(time.time()),))
+
+
+# --- Projects ---
+def _upsert_project(conn, project):
+    data = {k: v for k, v in project.items() if k != "custom_usps"}
+    # ON CONFLICT keeps the rowid, so projects keep their original order like keys in the old JSON file
+    conn.execute(
+        "INSERT INTO projects (name, type, data, updated_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET type = excluded.type, data = excluded.data, updated_at = excluded.updated_at",
+        (data["name"], data.get("type", ""), json.dumps(data, ensure_ascii=False), time.time()),
+    )
+
+
+def _replace_usps(conn, project_name, usps):
+    conn.execute("DELETE FROM project_usps WHERE project = ?", (project_name,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO project_usps (project, usp, position) VALUES (?, ?, ?)",
+        [(project_name, usp, i) for i, usp in enumerate(usps)],
+    )
+
+
+def _project_usps(conn, project_name):
+    return [r["usp"] for r in conn.execute(
+        "SELECT usp FROM project_usps WHERE project = ? ORDER BY position", (project_name,))]
+
+
+def _project_from_row(conn, row):
+    project = json.loads(row["data"])
+    usps = _project_usps(conn, row["name"])
+    if usps:
+        project["custom_usps"] = usps
+    return project
+
+
+def load_projects():
+    """All projects as {name: project}, in insertion order, with custom_usps like the old JSON file."""
+    conn = connect()
+    projects = {row["name"]: json.loads(row["data"]) for row in conn.execute("SELECT name, data FROM projects ORDER BY rowid")}
+    for row in conn.execute("SELECT project, usp FROM project_usps ORDER BY project, position"):
+        projects[row["project"]].setdefault("custom_usps", []).append(row["usp"])
+    return projects
+
+
+def get_project(name):
+    conn = connect()
+    row = conn.execute("SELECT name, data FROM projects WHERE name = ?", (name,)).fetchone()
+    return _project_from_row(conn, row) if row else None
+
+
+def projects_by_type(project_type):
+    conn = connect()
+    rows = conn.execute("SELECT name, data FROM projects WHERE type = ? ORDER BY rowid", (project_type,)).fetchall()
+    return {row["name"]: _project_from_row(conn, row) for row in rows}
+
+
+def save_project(project):
+    """Insert or update one project card; its saved custom USPs are left untouched."""
+    conn = connect()
+    with transaction(conn):
+        row = conn.execute("SELECT type FROM projects WHERE name = ?", (project["name"],)).fetchone()
+        _upsert_project(conn, project)
+        new_type = project.get("type", "")
+        if row and row["type"] != new_type:
+            # The project's USPs now count towards its new type
+            usps = _project_usps(conn, project["name"])
+            _index_usps(conn, row["type"], usps, -1)
+            _index_usps(conn, new_type, usps, 1)
+
+
+def save_project_usps(project_name, usps):
+    conn = connect()
+    with transaction(conn):
+        row = conn.execute("SELECT type FROM projects WHERE name = ?", (project_name,)).fetchone()
+        if not row:
+            raise KeyError(project_name)
+        _index_usps(conn, row["type"], _project_usps(conn, project_name), -1)
+        _replace_usps(conn, project_name, usps)
+        _index_usps(conn, row["type"], usps, 1)
+
+
+def all_custom_usps():
+    return [r["usp"] for r in connect().execute("SELECT DISTINCT usp FROM project_usps ORDER BY usp")]
+
+
+# --- USP index ---
+def normalize_usp(usp):
+    return " ".join(usp.split()).casefold()
+
+
+def _index_usps(conn, project_type, usps, delta):
+    # Add (delta=1) or remove (delta=-1) one project's USPs; each normalized USP counts once per project
+    labels = {}
+    for usp in usps:
+        labels.setdefault(normalize_usp(usp), usp.strip())
+    conn.executemany(
+        "INSERT INTO usp_index (norm, project_type, label, projects) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(norm, project_type) DO UPDATE SET projects = projects + excluded.projects, "
+        "label = CASE WHEN excluded.projects > 0 THEN excluded.label ELSE label END",
+        [(norm, project_type, label, delta) for norm, label in labels.items() if norm],
+    )
+    conn.execute("DELETE FROM usp_index WHERE projects <= 0")
+
+
+def build_usp_index(conn, rebuild=False):
+    """Fill usp_index from the saved project USPs; runs once per database unless rebuild=True."""
+    with transaction(conn):
+        if not rebuild and conn.execute("SELECT 1 FROM meta WHERE key = 'usp_index_built'").fetchone():
+            return
+        conn.execute("DELETE FROM usp_index")
+        rows = conn.execute(
+            "SELECT p.name, p.type, u.usp FROM projects p JOIN project_usps u ON u.project = p.name "
+            "ORDER BY p.rowid, u.position").fetchall()
+        by_project = {}
+        for row in rows:
+            by_project.setdefault((row["name"], row["type"]), []).append(row["usp"])
+        for (_, project_type), usps in by_project.items():
+            _index_usps(conn, project_type, usps, 1)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('usp_index_built', ?)", (str(time.time()),))
+
+
+def top_usps(project_type, query="", limit=12):
+    """Saved custom USPs ranked by use in projects of project_type, then overall; query filters by substring.
+
+    Returns [(label, projects_of_this_type, projects_total)].
+    """
+    pattern = "%" + normalize_usp(query).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    rows = connect().execute(
+        "SELECT norm, "
+        "MAX(CASE WHEN project_type = ? THEN label END) AS type_label, MAX(label) AS any_label, "
+        "SUM(CASE WHEN project_type = ? THEN projects ELSE 0 END) AS type_count, SUM(projects) AS total "
+        "FROM usp_index WHERE norm LIKE ? ESCAPE '\\' GROUP BY norm "
+        "ORDER BY type_count DESC, total DESC, norm LIMIT ?",
+        (project_type, project_type, pattern, limit),
+    ).fetchall()
+    return [(r["type_label"] or r["any_label"], r["type_count"], r["total"]) for r in rows]
+
+
+# --- Style profiles and website text styles ---
+def _upsert_named(conn, table, name, data):
+    conn.execute(
+        f"INSERT INTO {table} (name, data, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+        (name, json.dumps(data, ensure_ascii=False), time.time()),
+    )
+
+
+def _load_named(table):
+    rows = connect().execute(f"SELECT name, data FROM {table} ORDER BY rowid").fetchall()
+    return {row["name"]: json.loads(row["data"]) for row in rows}
+
+
+def _save_named(table, name, data):
+    conn = connect()
+    with transaction(conn):
+        _upsert_named(conn, table, name, data)
+
+
+def load_style_profiles():
+    return _load_named("style_profiles")
+
+
+def save_style_profile(name, style):
+    _save_named("style_profiles", name, style)
+
+
+def load_website_styles():
+    return _load_named("website_styles")
+
+
+def save_website_style(name, style):
+    _save_named("website_styles", name, style)
@@ -0,0 +1,177 @@
+# Lightweight instrumentation: timed spans and counters, grouped per Streamlit rerun.
+# Spans (OpenAI calls, generation, image fitting and encoding, data loads) and counters (tokens, bytes of
+# markup rendered) are kept in bounded in-memory buffers for the Performance page and appended as JSON lines
+# to LOG_PATH for scraping. A rerun's counters are logged as one summary line when its session reruns next.
+# Fragment reruns run on their own script thread without the page's begin_rerun(); fragments start their own
+# rerun record when is_fragment_rerun() is true, so their spans keep the session.
+# Recording a span costs a few microseconds plus one small file append.
+
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOG_PATH = os.getenv("ARCHINEWS_METRICS_LOG", "data/logs/metrics.jsonl")
+MAX_SPANS = 5000
+MAX_RUNS = 500
+
+SPANS = deque(maxlen=MAX_SPANS)
+RUNS = deque(maxlen=MAX_RUNS)
+
+_current_run = contextvars.ContextVar("telemetry_run", default=None)
+_run_ids = itertools.count(1)
+_open_runs = {}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+def _log(entry):
+    if not LOG_PATH:
+        return
+    line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    with _log_lock:
+        try:
+            os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass
+
+
+def session_id():
+    # None outside a Streamlit script thread; imported lazily so image worker processes never load Streamlit
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+
+def is_fragment_rerun():
+    """True in a script run that only reruns fragments (the page's top-level code does not run)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return False
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def _summary(run):
+    return {"type": "rerun", "run": run["run"], "session": run["session"], "page": run["page"],
+            "ts": run["started"], "span_ms": run["span_ms"], "counters": run["counters"]}
+
+
+def begin_rerun(page):
+    """Start a new rerun record for the current session; call once at the top of a page."""
+    session = session_id()
+    run = {"run": next(_run_ids), "session": session, "page": page, "started": time.time(), "span_ms": {}, "counters": {}}
+    with _lock:
+        RUNS.append(run)
+        previous = _open_runs.pop(session, None)
+        _open_runs[session] = run
+    if previous is not None:
+        _log(_summary(previous))
+    _current_run.set(run)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+def count(name, value=1):
+    """Add value to a per-rerun counter (e.g. tokens, bytes_rendered)."""
+    run = _current_run.get()
+    if run is not None and value:
+        with _lock:
+            run["counters"][name] = run["counters"].get(name, 0) + value
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block. Yields the attribute dict, so the block can add results such as token counts."""
+    started = time.time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        run = _current_run.get()
+        record = {"type": "span", "ts": started, "name": name, "ms": round(ms, 3), "attrs": attrs,
+                  "run": run["run"] if run else None, "session": run["session"] if run else None,
+                  "page": run["page"] if run else None, "error": error}
+        with _lock:
+            SPANS.append(record)
+            if run is not None:
+                run["span_ms"][name] = round(run["span_ms"].get(name, 0.0) + ms, 3)
+        _log(record)
+
+
+def timed(name=None):
+    """Decorator form of span()."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def submit(pool, fn, *args, **kwargs):
+    # ThreadPoolExecutor.submit that keeps the caller's rerun, so spans in the worker are attributed to it
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# --- Read side for the Performance page ---
+def recent_runs(session=None, limit=100):
+    with _lock:
+        runs = [dict(r, span_ms=dict(r["span_ms"]), counters=dict(r["counters"])) for r in RUNS]
+    if session is not None:
+        runs = [r for r in runs if r["session"] == session]
+    return runs[-limit:][::-1]
+
+
+def recent_spans(session=None, limit=200):
+    with _lock:
+        spans = list(SPANS)
+    if session is not None:
+        spans = [s for s in spans if s["session"] == session]
+    return spans[-limit:][::-1]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def span_stats(session=None):
+    """Per span name: count, total, median, p95 and max duration in ms over the buffered spans."""
+    by_name = {}
+    for record in recent_spans(session, MAX_SPANS):
+        by_name.setdefault(record["name"], []).append(record["ms"])
+    return {
+        name: {"count": len(values), "total_ms": round(sum(values), 1), "p50_ms": round(_percentile(values, 0.5), 1),
+               "p95_ms": round(_percentile(values, 0.95), 1), "max_ms": round(max(values), 1)}
+        for name, values in sorted(by_name.items(), key=lambda item: -sum(item[1]))
+    }
+
+
+def clear():
+    with _lock:
+        SPANS.clear()
+        RUNS.clear()
+        _open_runs.clear()
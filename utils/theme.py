@@ -0,0 +1,50 @@
+# Shared page chrome: brand colours, the green button style, page headers and dividers.
+# Every page emits its CSS and header through page_header() as a single element per run,
+# instead of each page inlining its own copy of the stylesheet.
+
+import streamlit as st
+
+BRAND_GREEN = "#14532d"
+DIVIDER_GRAY = "#d1d5db"
+
+BUTTON_CSS = f"""
+div.stButton > button {{
+    background-color: {BRAND_GREEN} !important; /* dark green fill */
+    color: white !important;
+    border: none !important;
+    border-radius: 6px !important;
+    padding: 0.5em 1.5em !important;
+    font-size: 1.08em !important;
+    font-weight: 600 !important;
+    transition: background 0.2s;
+}}
+div.stButton > button:hover {{
+    background-color: {DIVIDER_GRAY} !important; /* lighter gray on hover */
+    color: #fff !important;
+}}
+"""
+
+# Home page: no sidebar or navigation, the page links replace it
+HIDE_SIDEBAR_CSS = """
+[data-testid="stSidebar"], [data-testid="stSidebarNav"], [data-testid="stSidebarNavItems"], [data-testid="stSidebarUserContent"], [data-testid="stSidebarCollapseControl"] {
+    display: none !important;
+}
+header [data-testid="stHeader"] { z-index: 1; }
+"""
+
+
+def apply_css(*blocks):
+    st.markdown("<style>" + "".join(blocks) + "</style>", unsafe_allow_html=True)
+
+
+def page_header(title, subtitle):
+    """Button styling plus the green page title and subtitle, in one element."""
+    st.markdown(f"""
+<style>{BUTTON_CSS}</style>
+<h1 style='font-size:2.3em; color:{BRAND_GREEN}; margin-bottom:0.5em;'>{title}</h1>
+<div style='font-size:1.15em; color:#222; margin-bottom:2em;'>{subtitle}</div>
+""", unsafe_allow_html=True)
+
+
+def divider():
+    st.markdown(f"<hr style='border: none; border-top: 2px solid {DIVIDER_GRAY}; margin: 2em 0;'>", unsafe_allow_html=True)